@@ -1,24 +1,32 @@
 from flask import (
     Flask, render_template, jsonify, send_file,
-    after_this_request, request, Response
+    after_this_request, request, Response, redirect
 )
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.utils import send_file as werkzeug_send_file
+from werkzeug.wsgi import FileWrapper
 
 import yt_dlp
+import atexit
 import os
 import uuid
 import re
+import queue
 import threading
 import time
 import requests
-from datetime import timedelta
-from urllib.parse import urlparse, parse_qs
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.parse import urlparse, parse_qs, quote
 from io import BytesIO
 
-from mutagen.mp3 import MP3
-from mutagen.id3 import ID3, APIC, TIT2, TPE1, TDRC, TCON
 from mutagen.mp4 import MP4, MP4Cover
 from mutagen.oggopus import OggOpus
 from mutagen.oggvorbis import OggVorbis
@@ -28,9 +36,13 @@ from PIL import Image
 import logging
 import traceback
 import subprocess
-import hashlib
+import errno
 import shutil
+import hashlib
+import json
+import heapq
 import base64
+import unicodedata
 
 # psutil is optional but recommended (for killing ffmpeg cleanly)
 try:
@@ -39,6 +51,27 @@ try:
 except ImportError:
     HAS_PSUTIL = False
 
+# flask-compress is optional (gzip/brotli for JSON responses)
+try:
+    from flask_compress import Compress
+    HAS_COMPRESS = True
+except ImportError:
+    HAS_COMPRESS = False
+
+# pyvips is optional (libvips shrink-on-load for artwork; Pillow otherwise)
+try:
+    import pyvips
+    HAS_PYVIPS = True
+except (ImportError, OSError):
+    HAS_PYVIPS = False
+
+# orjson is optional (C JSON encoder for the high-rate progress polls)
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 # ================== Logging ==================
 logging.basicConfig(
     level=logging.INFO,
@@ -57,16 +90,45 @@ yt_dlp_logger.setLevel(logging.WARNING)
 app = Flask(__name__)
 CORS(app)
 
+if HAS_COMPRESS:
+    app.config['COMPRESS_MIN_SIZE'] = 1024
+    Compress(app)
+
+if HAS_ORJSON:
+    class ORJSONProvider(DefaultJSONProvider):
+        """jsonify() through orjson; same sorted-key output as the default."""
+
+        def dumps(self, obj, **kwargs):
+            return orjson.dumps(
+                obj, default=self.default,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            ).decode()
+
+    app.json = ORJSONProvider(app)
+
+# Hand download bodies to the front-end server instead of streaming them
+# through a worker. USE_X_SENDFILE=1 emits X-Sendfile (Apache, lighttpd);
+# for nginx set X_ACCEL_REDIRECT_PREFIX to an internal location aliased to
+# the downloads folder, e.g.
+#   location /protected-downloads/ { internal; alias /srv/app/downloads/; }
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE') == '1'
+X_ACCEL_REDIRECT_PREFIX = os.getenv('X_ACCEL_REDIRECT_PREFIX', '')
+SEND_FILE_CHUNK_SIZE = 1024 * 1024  # per read when the server has no wsgi.file_wrapper
+
+# Point RATELIMIT_STORAGE_URI at redis:// (or memcached://) when running
+# several workers so limits are shared and expired by the backend.
 limiter = Limiter(
     app=app,
     key_func=get_remote_address,
     default_limits=["1000 per day", "200 per hour"],
-    storage_uri="memory://"
+    storage_uri=os.getenv('RATELIMIT_STORAGE_URI', 'memory://'),
+    strategy=os.getenv('RATELIMIT_STRATEGY', 'moving-window')
 )
 
 # ================== Config ==================
 DOWNLOAD_FOLDER = 'downloads'
 TEMP_FOLDER = 'temp'
+CACHE_FOLDER = 'cache'         # persistent; not swept by the cleanup thread
 MAX_DURATION = 14400           # 4 hours max
 CLEANUP_AGE = 600              # 10 minutes
 MAX_CONCURRENT_DOWNLOADS = 5
@@ -74,23 +136,204 @@ DOWNLOAD_TIMEOUT = 3600        # 1 hour max download time
 STALL_TIMEOUT = 180            # 3 minutes without progress
 PROCESSING_STALL_TIMEOUT = 600 # 10 minutes for processing
 FFMPEG_TIMEOUT = 1800          # 30 minutes for ffmpeg
-
-for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER]:
+# Per-ffmpeg thread cap: active_downloads already bounds concurrent jobs, so
+# this keeps their combined threads near the core count instead of N x cores.
+# sched_getaffinity honours cpusets (containers, taskset); cpu_count does not.
+CPU_COUNT = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 4)
+FFMPEG_THREADS = max(1, CPU_COUNT // MAX_CONCURRENT_DOWNLOADS)
+MAX_BATCH_SIZE = 5             # items per /api/convert-batch request
+GPU_MAX_SESSIONS = 2           # consumer NVENC caps concurrent sessions
+GPU_ACQUIRE_TIMEOUT = 30       # then fall back to the CPU encoder
+PROGRESS_HOOK_INTERVAL = 0.25  # min seconds between download progress updates
+VIDEO_INFO_CACHE_TTL = 300     # 5 minutes
+VIDEO_INFO_CACHE_SIZE = 100
+INFO_YDL_POOL_SIZE = 8         # idle warm YoutubeDL instances kept for /api/video-info
+INFO_YDL_MAX_USES = 200        # then closed and rebuilt (drops cookies, handlers)
+THUMBNAIL_CACHE_TTL = 300      # 5 minutes
+THUMBNAIL_CACHE_SIZE = 512
+THUMBNAIL_MAX_AGE = 31536000   # browser cache: ids are URL hashes, never reused
+THUMBNAIL_MAX_BYTES = 4 * 1024 * 1024  # fetch is dropped once the body passes this
+THUMBNAIL_MAX_PIXELS = 20_000_000      # decode cap against decompression bombs
+THUMBNAIL_FORMATS = ('JPEG', 'PNG', 'WEBP')
+VIPS_THUMBNAIL_LOADERS = ('jpegload', 'pngload', 'webpload')
+ARTWORK_CACHE_FOLDER = os.path.join(CACHE_FOLDER, 'artwork')
+ARTWORK_CACHE_TTL = 7 * 86400  # 7 days
+ARTWORK_CACHE_SIZE = 500
+ARTWORK_SIZE = 600             # embedded cover art is always this square JPEG
+PROGRESS_STREAM_INTERVAL = 0.5 # min seconds between SSE events per client (bursts coalesce)
+PROGRESS_STREAM_KEEPALIVE = 15 # comment line so proxies keep the stream open
+PROGRESS_STREAMS_PER_CLIENT = 4 # open SSE streams per client address; more get 429 and poll
+PROGRESS_RETENTION = 30        # progress kept this long after the file is served
+LOCK_STRIPES = 16              # per-task lock shards (power of two)
+
+for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER, CACHE_FOLDER, ARTWORK_CACHE_FOLDER]:
     os.makedirs(folder, exist_ok=True)
 
-conversion_progress = {}
-progress_lock = threading.Lock()
+Image.MAX_IMAGE_PIXELS = THUMBNAIL_MAX_PIXELS
+
+class NotifyingStripe:
+    """Context manager for one StripedLock stripe that notifies on release."""
+    __slots__ = ('cond',)
+
+    def __init__(self, cond):
+        self.cond = cond
+
+    def __enter__(self):
+        self.cond.acquire()
+
+    def __exit__(self, *exc):
+        self.cond.notify_all()
+        self.cond.release()
+
+
+class StripedLock:
+    """Fixed set of locks picked by key hash, so unrelated tasks don't contend.
+
+    Use ``with lock(task_id):`` for single-task work and ``with lock.all():``
+    for bulk enumeration (stripes are taken in order, so never nest it inside
+    a single-stripe hold).
+
+    With notify=True each stripe also has a Condition on its lock, and
+    ``with lock(key):`` wakes that stripe's condition(key) waiters on exit;
+    waiters hold the condition itself, so they never wake each other.
+    """
+
+    def __init__(self, stripes=LOCK_STRIPES, notify=False):
+        self.locks = [threading.Lock() for _ in range(stripes)]
+        self.mask = stripes - 1
+        self.conds = [threading.Condition(lock) for lock in self.locks] if notify else None
+        self.stripes = [NotifyingStripe(c) for c in self.conds] if notify else self.locks
+
+    def __call__(self, key):
+        return self.stripes[hash(key) & self.mask]
+
+    def condition(self, key):
+        return self.conds[hash(key) & self.mask]
+
+    @contextmanager
+    def all(self):
+        for lock in self.locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(self.locks):
+                lock.release()
+
+
+class CountingSemaphore:
+    """Semaphore whose acquire/release take a count, all or nothing.
+
+    One ffmpeg run with several NVENC outputs opens one encoder session
+    per output, so it has to hold that many slots at once; taking them one
+    at a time could leave two runs each holding part of what they need.
+    """
+
+    def __init__(self, value):
+        self.value = value
+        self.limit = value
+        self.cond = threading.Condition()
+
+    def acquire(self, count=1, timeout=None):
+        if count > self.limit:
+            return False
+        with self.cond:
+            if not self.cond.wait_for(lambda: self.value >= count, timeout):
+                return False
+            self.value -= count
+            return True
+
+    def release(self, count=1):
+        with self.cond:
+            self.value = min(self.value + count, self.limit)
+            self.cond.notify_all()
+
+
+conversion_progress = {}  # 'last_update' holds time.monotonic() readings
+progress_lock = StripedLock(notify=True)  # wakes progress streams on every update
 active_downloads = threading.Semaphore(MAX_CONCURRENT_DOWNLOADS)
+gpu_encode_sema = CountingSemaphore(GPU_MAX_SESSIONS)
 
 active_processes = {}
-process_lock = threading.Lock()
-
-video_info_cache = {}
+process_lock = StripedLock()
+
+task_files = {}  # task_id -> set of paths created for that task
+task_files_lock = threading.Lock()
+
+
+class LRUCache(OrderedDict):
+    """Size-bounded LRU whose entries expire once older than ttl.
+
+    Expired entries are dropped on read, and set() also pops expired
+    entries off the old end so idle keys don't sit around until the size
+    bound pushes them out. Not thread-safe on its own - callers hold the
+    matching lock.
+    """
+
+    def __init__(self, maxsize, ttl):
+        super().__init__()
+        self.maxsize = maxsize
+        self.ttl = ttl
+
+    def get_fresh(self, key):
+        entry = self.get(key)
+        if entry is None:
+            return None
+        stored_at, value = entry
+        if time.monotonic() - stored_at > self.ttl:
+            del self[key]
+            return None
+        self.move_to_end(key)
+        return value
+
+    def set(self, key, value):
+        now = time.monotonic()
+        self[key] = (now, value)
+        self.move_to_end(key)
+        while len(self) > self.maxsize:
+            self.popitem(last=False)
+        # Head is the least recently used entry; stop at the first fresh one.
+        while self and now - next(iter(self.values()))[0] > self.ttl:
+            self.popitem(last=False)
+
+
+video_info_cache = LRUCache(VIDEO_INFO_CACHE_SIZE, VIDEO_INFO_CACHE_TTL)
 cache_lock = threading.Lock()
 
-thumbnail_cache = {}
+thumbnail_cache = LRUCache(THUMBNAIL_CACHE_SIZE, THUMBNAIL_CACHE_TTL)
 thumbnail_cache_lock = threading.Lock()
 
+# ================== HTTP Session ==================
+# One pooled session so thumbnail fetches reuse keep-alive connections
+# to the same CDN hosts instead of a new TCP+TLS handshake per call.
+THUMBNAIL_HEADERS = {
+    'User-Agent':
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0.0.0 Safari/537.36',
+    'Accept':
+        'image/avif,image/webp,image/apng,image/svg+xml,'
+        'image/*,*/*;q=0.8',
+    'Accept-Language': 'en-US,en;q=0.9',
+    'Referer': 'https://www.facebook.com/',
+}
+
+http_session = requests.Session()
+_http_adapter = HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(
+        total=2,
+        backoff_factor=0.3,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=['GET', 'HEAD']
+    )
+)
+http_session.mount('http://', _http_adapter)
+http_session.mount('https://', _http_adapter)
+# The session only fetches thumbnails, so set their headers once here
+http_session.headers.update(THUMBNAIL_HEADERS)
+
 VIDEO_QUALITIES = {
     'best':  'bestvideo[ext=mp4]+bestaudio[ext=m4a]/best[ext=mp4]/best',
     '1080p': 'bestvideo[height<=1080][ext=mp4]+bestaudio[ext=m4a]/best[height<=1080][ext=mp4]/best',
@@ -132,7 +375,8 @@ AUDIO_FORMATS = {
         'quality': '256kbps',
         'description': 'Best for Apple devices - excellent quality, smaller size',
         'icon': '🍎',
-        'recommended': True
+        'recommended': True,
+        'copy_acodec': 'mp4a',  # source already AAC -> remux, no re-encode
     },
     'opus': {
         'extension': 'opus',
@@ -144,7 +388,9 @@ AUDIO_FORMATS = {
         'quality': '192kbps',
         'description': 'Modern codec - best quality/size ratio',
         'icon': '⚡',
-        'recommended': False
+        'recommended': False,
+        'download_format': 'bestaudio[acodec=opus]/bestaudio[ext=m4a]/bestaudio/best',
+        'copy_acodec': 'opus',
     },
     'ogg': {
         'extension': 'ogg',
@@ -156,10 +402,97 @@ AUDIO_FORMATS = {
         'quality': '192kbps',
         'description': 'Open source - great for Android & desktop',
         'icon': '🤖',
-        'recommended': False
+        'recommended': False,
+        'download_format': 'bestaudio[acodec=vorbis]/bestaudio[ext=m4a]/bestaudio/best',
+        'copy_acodec': 'vorbis',
     }
 }
 
+# Lower rank wins when several '<task_id>.<ext>' files exist.
+DOWNLOADED_EXT_PRIORITY = {ext: i for i, ext in enumerate(
+    ['.mp4', '.m4a', '.mp3', '.webm', '.mkv', '.opus', '.ogg', '.wav', '.flac'])}
+AUDIO_EXT_PRIORITY = {'.mp3': 0, '.m4a': 1, '.opus': 2, '.ogg': 3}
+# Finished outputs of either kind, for tasks whose progress entry is gone
+OUTPUT_EXT_PRIORITY = {**AUDIO_EXT_PRIORITY, '.mp4': len(AUDIO_EXT_PRIORITY)}
+
+# ================== Hardware Encoder Probe ==================
+VAAPI_DEVICE = '/dev/dri/renderD128'
+
+
+def ffmpeg_encoder_works(encoder, pre_input=(), video_filter=None):
+    """Encode one tiny frame to check the encoder actually initialises.
+
+    '-encoders' only lists what ffmpeg was built with; a GPU encoder still
+    fails at runtime if the device or driver is missing.
+    """
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', *pre_input,
+           '-f', 'lavfi', '-i', 'color=black:s=256x256:d=0.1']
+    if video_filter:
+        cmd.extend(['-vf', video_filter])
+    cmd.extend(['-c:v', encoder, '-frames:v', '1', '-f', 'null', '-'])
+    try:
+        return subprocess.run(cmd, capture_output=True, timeout=20).returncode == 0
+    except Exception:
+        return False
+
+
+try:
+    _encoders = subprocess.run(
+        ['ffmpeg', '-hide_banner', '-encoders'],
+        capture_output=True, text=True, timeout=10
+    ).stdout
+except Exception:
+    _encoders = ''
+
+HAS_NVENC = 'h264_nvenc' in _encoders and ffmpeg_encoder_works('h264_nvenc')
+HAS_QSV = 'h264_qsv' in _encoders and ffmpeg_encoder_works('h264_qsv')
+HAS_AMF = 'h264_amf' in _encoders and ffmpeg_encoder_works('h264_amf')
+HAS_VAAPI = (
+    'h264_vaapi' in _encoders and os.path.exists(VAAPI_DEVICE) and
+    ffmpeg_encoder_works('h264_vaapi', ['-vaapi_device', VAAPI_DEVICE], 'format=nv12,hwupload')
+)
+HAS_VIDEOTOOLBOX = 'h264_videotoolbox' in _encoders and ffmpeg_encoder_works('h264_videotoolbox')
+
+if HAS_NVENC:
+    VIDEO_ENCODER = 'h264_nvenc'
+elif HAS_QSV:
+    VIDEO_ENCODER = 'h264_qsv'
+elif HAS_AMF:
+    VIDEO_ENCODER = 'h264_amf'
+elif HAS_VAAPI:
+    VIDEO_ENCODER = 'h264_vaapi'
+elif HAS_VIDEOTOOLBOX:
+    VIDEO_ENCODER = 'h264_videotoolbox'
+else:
+    VIDEO_ENCODER = 'libx264'
+
+for _cfg in VIDEO_ENCODE_SETTINGS.values():
+    _cfg['codec'] = VIDEO_ENCODER
+
+
+# ================== Regex Patterns ==================
+# Compiled once; these run on every /api/video-info and /api/convert call.
+VIEWS_RE = re.compile(
+    r'[\s\|\-_•·:]*\d+[\d,\.]*\s*[KkMmBb]?\s*'
+    r'(views?|reactions?|likes?|comments?|shares?|plays?)[\s\|\-_•·:]*',
+    re.IGNORECASE
+)
+PLATFORM_SUFFIX_RE = re.compile(
+    r'\s*[\|\-•·:]\s*(Facebook|Instagram|TikTok|YouTube|Reels?|Watch)\s*$',
+    re.IGNORECASE
+)
+WHITESPACE_RE = re.compile(r'[\s_]+')
+ARTIST_SUFFIX_RE = re.compile(
+    r'\s*[-–]\s*(Official|VEVO|Music|Records|Channel).*$',
+    re.IGNORECASE
+)
+FN_SPACE_RE = re.compile(r'[\s\-]+')
+FN_KEEP_RE = re.compile(r'[^\w\-_.]')
+FN_UNDERSCORES_RE = re.compile(r'_+')
+SHORTS_RE = re.compile(r'/shorts/([a-zA-Z0-9_-]+)')
+FFMPEG_PROGRESS_RE = re.compile(r'^([a-z0-9_]+)=(.*)$')
+
+
 # ================== Title / Artist Helpers ==================
 def extract_clean_title(info):
     """Extract a clean title without views/reactions/etc."""
@@ -180,23 +513,12 @@ def extract_clean_title(info):
         return 'download'
 
     # Remove "56K views", "2.8K reactions", "123 likes", etc.
-    cleaned = re.sub(
-        r'[\s\|\-_•·:]*\d+[\d,\.]*\s*[KkMmBb]?\s*'
-        r'(views?|reactions?|likes?|comments?|shares?|plays?)[\s\|\-_•·:]*',
-        ' ',
-        title,
-        flags=re.IGNORECASE
-    )
+    cleaned = VIEWS_RE.sub(' ', title)
 
     # Remove platform suffixes
-    cleaned = re.sub(
-        r'\s*[\|\-•·:]\s*(Facebook|Instagram|TikTok|YouTube|Reels?|Watch)\s*$',
-        '',
-        cleaned,
-        flags=re.IGNORECASE
-    )
+    cleaned = PLATFORM_SUFFIX_RE.sub('', cleaned)
 
-    cleaned = re.sub(r'[\s_]+', ' ', cleaned).strip(' _-|•·')
+    cleaned = WHITESPACE_RE.sub(' ', cleaned).strip(' _-|•·')
     return cleaned if len(cleaned) >= 3 else 'download'
 
 
@@ -211,23 +533,24 @@ def extract_clean_artist(info):
     )
 
     if artist:
-        artist = re.sub(
-            r'\s*[-–]\s*(Official|VEVO|Music|Records|Channel).*$', '',
-            artist, flags=re.IGNORECASE
-        )
+        artist = ARTIST_SUFFIX_RE.sub('', artist)
 
     return artist.strip() or 'Unknown'
 
 
+@lru_cache(maxsize=256)
 def sanitize_filename(title, max_length=100):
-    """Convert title to a filesystem-safe filename."""
+    """Convert title to a filesystem-safe filename (pure, so memoised)."""
     if not title:
         return 'download'
 
-    filename = re.sub(r'[<>:"/\\|?*\x00-\x1f]', '', title)
-    filename = re.sub(r'[\s\-]+', '_', filename)
-    filename = re.sub(r'[^\w\-_.]', '', filename)
-    filename = re.sub(r'_+', '_', filename).strip('._')
+    # NFKC folds full-width and compatibility forms (e.g. 'ＡＢＣ', 'ﬁ') to
+    # plain characters; FN_KEEP_RE then drops anything unsafe, reserved
+    # characters and control codes included.
+    filename = unicodedata.normalize('NFKC', title)
+    filename = FN_SPACE_RE.sub('_', filename)
+    filename = FN_KEEP_RE.sub('', filename)
+    filename = FN_UNDERSCORES_RE.sub('_', filename).strip('._')
 
     if len(filename) > max_length:
         filename = filename[:max_length].strip('._')
@@ -242,16 +565,12 @@ def get_best_thumbnail(info):
     if not thumbs:
         return info.get('thumbnail', '')
 
-    thumbs_sorted = sorted(
-        thumbs,
-        key=lambda x: (x.get('height', 0) or 0) * (x.get('width', 0) or 0),
-        reverse=True
-    )
-    for t in thumbs_sorted:
-        url = t.get('url', '')
-        if url and not url.endswith('.webp'):
-            return url
-    return thumbs_sorted[0].get('url', '') if thumbs_sorted else info.get('thumbnail', '')
+    def area(t):
+        return (t.get('height', 0) or 0) * (t.get('width', 0) or 0)
+
+    non_webp = [t for t in thumbs if t.get('url') and not t['url'].endswith('.webp')]
+    best = max(non_webp or thumbs, key=area, default=None)
+    return (best.get('url') if best else '') or info.get('thumbnail', '')
 
 
 def fetch_thumbnail_bytes(url):
@@ -259,55 +578,231 @@ def fetch_thumbnail_bytes(url):
     if not url:
         return None
     try:
-        headers = {
-            'User-Agent':
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/120.0.0.0 Safari/537.36',
-            'Accept':
-                'image/avif,image/webp,image/apng,image/svg+xml,'
-                'image/*,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-            'Referer': 'https://www.facebook.com/',
-        }
-        resp = requests.get(url, headers=headers, timeout=10, allow_redirects=True)
-        resp.raise_for_status()
+        # Streamed so the cap holds for chunked/compressed bodies too, which
+        # have no usable Content-Length: reading stops once it is passed.
+        with http_session.get(url, timeout=10, allow_redirects=True, stream=True) as resp:
+            resp.raise_for_status()
+            if int(resp.headers.get('content-length') or 0) > THUMBNAIL_MAX_BYTES:
+                logger.warning(f"[THUMB FETCH] Too large: {resp.headers['content-length']} bytes")
+                return None
+            chunks = []
+            total = 0
+            for chunk in resp.iter_content(64 * 1024):
+                total += len(chunk)
+                if total > THUMBNAIL_MAX_BYTES:
+                    logger.warning(f"[THUMB FETCH] Too large: over {THUMBNAIL_MAX_BYTES} bytes")
+                    return None
+                chunks.append(chunk)
+            content = b''.join(chunks)
 
         ctype = resp.headers.get('content-type', '')
-        if 'image' in ctype or len(resp.content) > 1000:
-            return resp.content
+        if 'image' in ctype or len(content) > 1000:
+            return content
         return None
     except Exception as e:
         logger.warning(f"[THUMB FETCH] Failed: {e}")
         return None
 
 
-def download_thumbnail(url, save_path):
-    """Download thumbnail and make it a 600x600 JPEG for artwork."""
+# Outbound thumbnail fetches run on a shared pool. Concurrent requests for
+# the same thumb_id join the in-flight future instead of refetching.
+thumbnail_executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='thumb')
+thumbnail_fetches = {}  # thumb_id -> Future, guarded by thumbnail_cache_lock
+
+
+def thumbnail_file_path(thumb_id):
+    return os.path.join(TEMP_FOLDER, f"thumb_{thumb_id}.jpg")
+
+
+def save_thumbnail_file(thumb_id, img_data):
+    """Persist proxied thumbnail bytes so they can be served with send_file.
+
+    Returns the path, or None if writing failed (callers then keep the
+    bytes in memory instead).
+    """
+    path = thumbnail_file_path(thumb_id)
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(img_data)
+        os.replace(tmp_path, path)
+        return path
+    except OSError as e:
+        logger.warning(f"[THUMB SAVE] {thumb_id}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+
+class ThumbEntry:
+    """thumbnail_cache value; __slots__ keeps per-entry overhead small."""
+    __slots__ = ('url', 'data', 'path')
+
+    def __init__(self, url, data=None, path=None):
+        self.url = url
+        self.data = data
+        self.path = path
+
+
+def thumbnail_cache_entry(thumb_id, url, img_data):
+    """Cache entry for a proxied thumbnail, kept on disk when possible."""
+    path = save_thumbnail_file(thumb_id, img_data) if img_data else None
+    return ThumbEntry(url, None if path else img_data, path)
+
+
+def store_thumbnail(thumb_id, url):
+    """Fetch thumbnail bytes and fill them into the thumbnail_cache entry."""
     try:
         img_data = fetch_thumbnail_bytes(url)
-        if not img_data:
-            return False
+        if img_data:
+            entry = thumbnail_cache_entry(thumb_id, url, img_data)
+            with thumbnail_cache_lock:
+                cached = thumbnail_cache.get_fresh(thumb_id)
+                if cached is not None:
+                    cached.data, cached.path = entry.data, entry.path
+        return img_data
+    finally:
+        with thumbnail_cache_lock:
+            thumbnail_fetches.pop(thumb_id, None)
+
+
+def fetch_thumbnail_async(thumb_id, url):
+    """Start, or join, the background fetch for thumb_id."""
+    with thumbnail_cache_lock:
+        future = thumbnail_fetches.get(thumb_id)
+        if future is None:
+            future = thumbnail_executor.submit(store_thumbnail, thumb_id, url)
+            thumbnail_fetches[thumb_id] = future
+    return future
+
 
-        img = Image.open(BytesIO(img_data))
-        if img.mode != 'RGB':
-            img = img.convert('RGB')
+def artwork_cache_path(url):
+    return os.path.join(
+        ARTWORK_CACHE_FOLDER,
+        hashlib.blake2b(url.encode(), digest_size=16).hexdigest() + '.jpg'
+    )
 
-        w, h = img.size
-        if w != h:
-            min_side = min(w, h)
-            left = (w - min_side) // 2
-            top = (h - min_side) // 2
-            img = img.crop((left, top, left + min_side, top + min_side))
 
-        if img.width != 600:
-            img = img.resize((600, 600), Image.Resampling.LANCZOS)
+def store_artwork(data, cache_path):
+    """Write finished artwork into the cache, then trim it to ARTWORK_CACHE_SIZE.
 
-        img.save(save_path, 'JPEG', quality=95, optimize=True)
-        return os.path.exists(save_path)
+    Eviction is FIFO by write time, not LRU: hits don't touch the file,
+    since its mtime is also what ARTWORK_CACHE_TTL is measured from.
+    """
+    tmp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, cache_path)
+        with os.scandir(ARTWORK_CACHE_FOLDER) as entries:
+            files = [e for e in entries if e.name.endswith('.jpg')]
+        if len(files) > ARTWORK_CACHE_SIZE:
+            files.sort(key=lambda e: e.stat().st_mtime)  # oldest written first
+            for entry in files[:len(files) - ARTWORK_CACHE_SIZE]:
+                os.remove(entry.path)
+    except OSError as e:
+        logger.warning(f"[ARTWORK CACHE] {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def pil_artwork(img_data):
+    """ARTWORK_SIZE square RGB JPEG bytes from source image bytes (Pillow)."""
+    img = Image.open(BytesIO(img_data), formats=THUMBNAIL_FORMATS)
+    # Image.MAX_IMAGE_PIXELS alone only warns below twice the limit, so
+    # check the header size against the cap before anything is decoded
+    if img.size[0] * img.size[1] > THUMBNAIL_MAX_PIXELS:
+        logger.warning(f"[ARTWORK] Too many pixels: {img.size[0]}x{img.size[1]}")
+        return None
+    # Let libjpeg downscale during decode (1/2, 1/4, 1/8) while both
+    # sides stay >= 600, so the centre crop still covers 600x600.
+    # No-op for non-JPEG sources.
+    img.draft('RGB', (ARTWORK_SIZE, ARTWORK_SIZE))
+    img.load()
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Centre square crop folded into the resize via box= (no crop copy)
+    w, h = img.size
+    side = min(w, h)
+    left = (w - side) // 2
+    top = (h - side) // 2
+    if (w, h) != (ARTWORK_SIZE, ARTWORK_SIZE):
+        # After draft() the remaining scale is usually under 2x, where
+        # bilinear is indistinguishable at 600px and about half the cost
+        resample = Image.Resampling.BILINEAR if side < 1800 else Image.Resampling.BICUBIC
+        img = img.resize((ARTWORK_SIZE, ARTWORK_SIZE), resample, box=(left, top, left + side, top + side))
+
+    # Encoded once per URL (then served from the artwork cache), so the
+    # optimised Huffman pass is worth it. Stays baseline: some car
+    # stereos and older players won't show progressive cover art.
+    out = BytesIO()
+    img.save(out, 'JPEG', quality=88, optimize=True, progressive=False, subsampling=2)
+    return out.getvalue()
+
+
+def vips_artwork(img_data):
+    """pil_artwork via libvips; None for formats outside THUMBNAIL_FORMATS.
+
+    thumbnail_buffer decodes with shrink-on-load and crops/scales in one
+    streaming pass, so the full-size source is never held in memory.
+    """
+    # Header only (nothing is decoded yet). It names the loader, and gives
+    # the same THUMBNAIL_MAX_PIXELS check pil_artwork makes; PNG has no
+    # shrink-on-load, so an oversized one would otherwise be decoded in full.
+    header = pyvips.Image.new_from_buffer(img_data, '', access='sequential')
+    if not header.get('vips-loader').startswith(VIPS_THUMBNAIL_LOADERS):
+        return None
+    if header.width * header.height > THUMBNAIL_MAX_PIXELS:
+        logger.warning(f"[ARTWORK] Too many pixels: {header.width}x{header.height}")
+        return None
+    img = pyvips.Image.thumbnail_buffer(img_data, ARTWORK_SIZE, height=ARTWORK_SIZE, crop='centre')
+    if img.hasalpha():
+        img = img.flatten()
+    if img.interpretation != 'srgb':
+        img = img.colourspace('srgb')
+    return img.jpegsave_buffer(Q=88, optimize_coding=True, interlace=False, strip=True)
+
+
+def download_thumbnail(url, save_path=None):
+    """Download thumbnail and make it a 600x600 JPEG for artwork.
+
+    Returns the JPEG bytes (None on failure) and also writes them to
+    save_path when one is given (ffmpeg needs a file; mutagen takes bytes).
+    Finished artwork is kept in ARTWORK_CACHE_FOLDER keyed by URL hash, so
+    converting the same video again within ARTWORK_CACHE_TTL of the first
+    fetch skips the fetch and the resize.
+    """
+    cache_path = artwork_cache_path(url)
+    data = None
+    try:
+        if time.time() - os.path.getmtime(cache_path) < ARTWORK_CACHE_TTL:
+            with open(cache_path, 'rb') as f:
+                data = f.read()
+    except OSError:
+        pass
+
+    try:
+        if not data:
+            img_data = fetch_thumbnail_bytes(url)
+            if not img_data:
+                return None
+            data = vips_artwork(img_data) if HAS_PYVIPS else pil_artwork(img_data)
+            if not data:
+                return None
+            store_artwork(data, cache_path)
+
+        if save_path:
+            with open(save_path, 'wb') as f:
+                f.write(data)
+        return data
     except Exception as e:
         logger.error(f"[THUMB SAVE] Error: {e}")
-        return False
+        return None
 
 
 # ================== Timeout Helpers ==================
@@ -356,104 +851,262 @@ def kill_process_tree(pid):
         return False
 
 
-def run_ffmpeg_with_progress(cmd, task_id, timeout=1800, stage="processing"):
-    """Run ffmpeg and keep progress alive to avoid stall detection."""
+def run_ffmpeg_with_progress(cmd, task_id, timeout=1800, stage="processing",
+                             duration=None, end_percent=None,
+                             use_gpu=False, cpu_cmd=None, gpu_sessions=1):
+    """Run ffmpeg and follow its -progress stream on a reader thread.
+
+    Each progress block refreshes last_update (so stall detection stays
+    quiet) and, when the media duration is known, reports real percent.
+
+    With use_gpu the run holds gpu_sessions gpu_encode_sema slots (one per
+    hardware-encoded output) for its whole lifetime. The wait for them is
+    bounded by GPU_ACQUIRE_TIMEOUT, since nothing is registered for the
+    stall checker yet: after that cpu_cmd (the software-encoder argv)
+    runs instead, or the run fails if there is none.
+    """
+    gpu_held = False
+    if use_gpu:
+        gpu_held = gpu_encode_sema.acquire(gpu_sessions, timeout=GPU_ACQUIRE_TIMEOUT)
+        if gpu_held:
+            logger.info(f"[FFMPEG] {task_id[:8]} using GPU encoder ({gpu_sessions} sessions)")
+        elif cpu_cmd:
+            logger.warning(f"[FFMPEG] {task_id[:8]} GPU sessions busy, using CPU encoder")
+            cmd = cpu_cmd
+        else:
+            logger.error(f"[FFMPEG] {task_id[:8]} no GPU session within {GPU_ACQUIRE_TIMEOUT}s")
+            return False, "GPU encoder busy"
+
     try:
-        process = subprocess.Popen(
-            cmd,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            bufsize=1
-        )
+        # -hide_banner keeps the build banner out of the stderr we parse
+        cmd = [cmd[0], '-hide_banner', '-progress', 'pipe:2', '-nostats'] + list(cmd[1:])
+        try:
+            process = subprocess.Popen(
+                cmd,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                universal_newlines=True,
+                errors='replace',
+                bufsize=1
+            )
+        except Exception as e:
+            logger.error(f"[FFMPEG] Exception: {e}")
+            return False, str(e)
 
-        with process_lock:
+        with process_lock(task_id):
             active_processes[task_id] = process
 
-        start_time = time.time()
-        last_update = start_time
+        start_time = time.monotonic()
+        with progress_lock(task_id):
+            start_percent = conversion_progress.get(task_id, {}).get('percent', 0)
+        stderr_tail = deque(maxlen=20)
+
+        def report(out_time_us):
+            with progress_lock(task_id):
+                cur = conversion_progress.get(task_id)
+                if not cur:
+                    return
+                cur['last_update'] = time.monotonic()
+                if cur.get('status') != stage:
+                    return
+                base = cur.get('message', 'Processing').split('(')[0].strip()
+                if duration and out_time_us:
+                    frac = min(out_time_us / 1_000_000 / duration, 1.0)
+                    cur['message'] = f"{base} ({int(frac * 100)}%)..."
+                    if end_percent:
+                        pct = start_percent + (end_percent - start_percent) * frac
+                        cur['percent'] = max(cur.get('percent', 0), pct)
+                else:
+                    elapsed = int(time.monotonic() - start_time)
+                    cur['message'] = f"{base} ({elapsed}s)..."
 
-        while True:
-            poll = process.poll()
-            if poll is not None:
-                _, stderr = process.communicate()
-                with process_lock:
-                    active_processes.pop(task_id, None)
-                if poll == 0:
-                    return True, ""
-                return False, stderr
+        def read_stderr():
+            out_time_us = 0
+            try:
+                for line in process.stderr:
+                    line = line.strip()
+                    m = FFMPEG_PROGRESS_RE.match(line)
+                    if not m:
+                        if line:
+                            stderr_tail.append(line)
+                        continue
+                    key, value = m.groups()
+                    if key in ('out_time_us', 'out_time_ms'):
+                        try:
+                            out_time_us = int(value)
+                        except ValueError:
+                            pass
+                    elif key == 'progress':
+                        report(out_time_us)
+            except Exception as e:
+                logger.warning(f"[FFMPEG] Reader stopped: {e}")
 
-            if time.time() - start_time > timeout:
-                logger.error(f"[FFMPEG] Timeout for {task_id[:8]}")
-                try:
-                    process.kill()
-                except Exception:
-                    pass
-                with process_lock:
-                    active_processes.pop(task_id, None)
-                return False, "FFmpeg timeout"
-
-            if time.time() - last_update > 10:
-                with progress_lock:
-                    if task_id in conversion_progress:
-                        conversion_progress[task_id]['last_update'] = time.time()
-                        cur = conversion_progress[task_id]
-                        if cur.get('status') == stage:
-                            elapsed = int(time.time() - start_time)
-                            base = cur.get('message', 'Processing').split('(')[0].strip()
-                            cur['message'] = f"{base} ({elapsed}s)..."
-                last_update = time.time()
-
-            time.sleep(0.5)
-    except Exception as e:
-        logger.error(f"[FFMPEG] Exception: {e}")
-        with process_lock:
-            active_processes.pop(task_id, None)
-        return False, str(e)
+        reader = threading.Thread(target=read_stderr, daemon=True)
+        reader.start()
+
+        try:
+            returncode = process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            logger.error(f"[FFMPEG] Timeout for {task_id[:8]}")
+            try:
+                process.kill()
+                process.wait(timeout=5)
+            except Exception:
+                pass
+            return False, "FFmpeg timeout"
+        finally:
+            with process_lock(task_id):
+                active_processes.pop(task_id, None)
+
+        reader.join(timeout=5)
+        if returncode == 0:
+            return True, ""
+        return False, '\n'.join(stderr_tail)
+    finally:
+        if gpu_held:
+            gpu_encode_sema.release(gpu_sessions)
+
+
+# ================== Task File Registry ==================
+def move_into_place(src, dst):
+    """Atomic rename onto dst; copies only if the two sit on different filesystems."""
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
+def register_task_file(task_id, path):
+    """Remember a file created for task_id so cleanup needs no folder scan."""
+    if not path:
+        return
+    with task_files_lock:
+        task_files.setdefault(task_id, set()).add(path)
+
+
+def remove_task_files(task_id):
+    """Delete every registered file for task_id and forget the task."""
+    with task_files_lock:
+        paths = task_files.pop(task_id, ())
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def forget_task_files(task_id):
+    """Drop the registry entry for a finished task without deleting anything."""
+    with task_files_lock:
+        task_files.pop(task_id, None)
+
+
+def find_task_file(task_id, ext_priority, other_suffix=''):
+    """Pick task_id's best file in DOWNLOAD_FOLDER in one scandir pass.
+
+    ext_priority maps extensions of '<task_id><ext>' names to a rank (lower
+    wins). Any other file starting with task_id and ending in other_suffix
+    ranks after those, as a last resort; other_suffix=None means exact
+    names only.
+    """
+    best, best_rank = None, None
+    fallback_rank = len(ext_priority)
+    try:
+        with os.scandir(DOWNLOAD_FOLDER) as entries:
+            for entry in entries:
+                if not entry.name.startswith(task_id) or not entry.is_file():
+                    continue
+                stem, ext = os.path.splitext(entry.name)
+                rank = ext_priority.get(ext) if stem == task_id else None
+                if rank is None:
+                    if other_suffix is None or not entry.name.lower().endswith(other_suffix):
+                        continue
+                    rank = fallback_rank
+                if best_rank is None or rank < best_rank:
+                    best, best_rank = entry.path, rank
+    except OSError:
+        return None
+    return best
 
 
 # ================== Stall Detection ==================
+# One (deadline, task_id) heap entry per active task. The checker sleeps
+# until the earliest deadline, then re-reads the task: if it made
+# progress meanwhile the entry is pushed back at last_update + timeout,
+# so the hot progress paths never touch the heap.
+stall_heap = []
+stall_cond = threading.Condition()
+
+
+def stall_timeout_for(status):
+    return PROCESSING_STALL_TIMEOUT if status in ['processing', 'embedding'] else STALL_TIMEOUT
+
+
+def schedule_stall_check(task_id, deadline):
+    with stall_cond:
+        heapq.heappush(stall_heap, (deadline, task_id))
+        if stall_heap[0][1] == task_id:
+            stall_cond.notify()
+
+
+def check_task_stalled(task_id):
+    """Handle a due heap entry: fail the task if stalled, else re-arm it."""
+    now = time.monotonic()
+    next_deadline = None
+    with progress_lock(task_id):
+        info = conversion_progress.get(task_id)
+        if not info:
+            return
+        status = info.get('status', '')
+        if status in ['completed', 'error', 'cancelled', 'unknown']:
+            return
+        timeout = stall_timeout_for(status)
+        last = info.get('last_update', 0)
+        if not last:
+            next_deadline = now + timeout
+        elif now - last <= timeout:
+            next_deadline = last + timeout
+        else:
+            stall = now - last
+            logger.warning(f"[STALL] {task_id[:8]} stalled in '{status}' for {int(stall)}s")
+            with process_lock(task_id):
+                if task_id in active_processes:
+                    proc = active_processes[task_id]
+                    try:
+                        if hasattr(proc, 'pid'):
+                            kill_process_tree(proc.pid)
+                        else:
+                            proc.kill()
+                        active_processes.pop(task_id, None)
+                    except Exception:
+                        pass
+            conversion_progress[task_id] = {
+                'status': 'error',
+                'percent': info.get('percent', 0),
+                'message': 'Process stalled. Please try again.',
+                'last_update': now
+            }
+            remove_task_files(task_id)
+
+    if next_deadline is not None:
+        schedule_stall_check(task_id, next_deadline)
+
+
 def check_stalled_downloads():
     while True:
         try:
-            time.sleep(15)
-            now = time.time()
-            with progress_lock:
-                for task_id, info in list(conversion_progress.items()):
-                    status = info.get('status', '')
-                    if status in ['completed', 'error', 'cancelled', 'unknown']:
-                        continue
-                    last = info.get('last_update', 0)
-                    if not last:
-                        continue
-                    stall = now - last
-                    timeout = PROCESSING_STALL_TIMEOUT if status in ['processing', 'embedding'] else STALL_TIMEOUT
-                    if stall > timeout:
-                        logger.warning(f"[STALL] {task_id[:8]} stalled in '{status}' for {int(stall)}s")
-                        with process_lock:
-                            if task_id in active_processes:
-                                proc = active_processes[task_id]
-                                try:
-                                    if hasattr(proc, 'pid'):
-                                        kill_process_tree(proc.pid)
-                                    else:
-                                        proc.kill()
-                                    active_processes.pop(task_id, None)
-                                except Exception:
-                                    pass
-                        conversion_progress[task_id] = {
-                            'status': 'error',
-                            'percent': info.get('percent', 0),
-                            'message': 'Process stalled. Please try again.',
-                            'last_update': now
-                        }
-                        for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER]:
-                            try:
-                                for fname in os.listdir(folder):
-                                    if fname.startswith(task_id):
-                                        os.remove(os.path.join(folder, fname))
-                            except Exception:
-                                pass
+            with stall_cond:
+                while not stall_heap:
+                    stall_cond.wait()
+                deadline, task_id = stall_heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    stall_cond.wait(timeout=delay)
+                    continue
+                heapq.heappop(stall_heap)
+            check_task_stalled(task_id)
         except Exception as e:
             logger.error(f"[STALL CHECK] Error: {e}")
 
@@ -462,33 +1115,41 @@ threading.Thread(target=check_stalled_downloads, daemon=True).start()
 
 
 # ================== Cleanup Thread ==================
+def remove_old_files(folder, now, busy):
+    """Delete files older than CLEANUP_AGE in folder unless their task is busy."""
+    cleaned = 0
+    if not os.path.exists(folder):
+        return cleaned
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                if now - entry.stat().st_mtime <= CLEANUP_AGE:
+                    continue
+                task_id = entry.name.split('.')[0].split('_')[0]
+                if task_id not in busy:
+                    os.remove(entry.path)
+                    cleaned += 1
+            except Exception:
+                pass
+    return cleaned
+
+
 def cleanup_old_files():
     while True:
         try:
-            now = time.time()
-            cleaned = 0
-            for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER]:
-                if not os.path.exists(folder):
-                    continue
-                for name in os.listdir(folder):
-                    path = os.path.join(folder, name)
-                    try:
-                        if os.path.isfile(path):
-                            age = now - os.path.getmtime(path)
-                            if age > CLEANUP_AGE:
-                                task_id = name.split('.')[0].split('_')[0]
-                                with progress_lock:
-                                    info = conversion_progress.get(task_id, {})
-                                    if info.get('status') not in ['downloading', 'processing', 'embedding', 'connecting', 'starting']:
-                                        os.remove(path)
-                                        cleaned += 1
-                    except Exception:
-                        pass
-            # cleanup thumbnail cache
-            with thumbnail_cache_lock:
-                old_keys = [k for k, v in thumbnail_cache.items() if now - v.get('time', 0) > 300]
-                for k in old_keys:
-                    thumbnail_cache.pop(k, None)
+            now = time.time()  # wall clock: compared against file mtimes
+            with progress_lock.all():
+                busy = {
+                    tid for tid, info in conversion_progress.items()
+                    if info.get('status') in ['downloading', 'processing', 'embedding', 'connecting', 'starting']
+                }
+            # The folders share no state; scan them concurrently so slow
+            # (e.g. network) mounts don't add up.
+            folders = [DOWNLOAD_FOLDER, TEMP_FOLDER]
+            with ThreadPoolExecutor(max_workers=len(folders)) as ex:
+                cleaned = sum(ex.map(lambda f: remove_old_files(f, now, busy), folders))
             if cleaned:
                 logger.info(f"[CLEANUP] Removed {cleaned} files")
         except Exception as e:
@@ -499,20 +1160,71 @@ def cleanup_old_files():
 threading.Thread(target=cleanup_old_files, daemon=True).start()
 
 
+# Served tasks drop their progress entry PROGRESS_RETENTION seconds later.
+# The delay is fixed, so appending keeps the deque ordered by due time and
+# one thread handles every pending expiry.
+progress_expiry = deque()  # (due, task_id)
+progress_expiry_cond = threading.Condition()
+
+
+def schedule_progress_expiry(task_id):
+    with progress_expiry_cond:
+        progress_expiry.append((time.monotonic() + PROGRESS_RETENTION, task_id))
+        if len(progress_expiry) == 1:
+            progress_expiry_cond.notify()
+
+
+def expire_served_progress():
+    while True:
+        try:
+            with progress_expiry_cond:
+                while not progress_expiry:
+                    progress_expiry_cond.wait()
+                due, task_id = progress_expiry[0]
+                delay = due - time.monotonic()
+                if delay > 0:
+                    progress_expiry_cond.wait(timeout=delay)
+                    continue
+                progress_expiry.popleft()
+            with progress_lock(task_id):
+                conversion_progress.pop(task_id, None)
+        except Exception as e:
+            logger.error(f"[EXPIRY] Error: {e}")
+
+
+threading.Thread(target=expire_served_progress, daemon=True).start()
+
+
 # ================== URL Helpers ==================
+YOUTUBE_HOSTS = frozenset({
+    'youtube.com', 'www.youtube.com', 'm.youtube.com', 'music.youtube.com'
+})
+YOUTU_BE_HOSTS = frozenset({'youtu.be', 'www.youtu.be'})
+FACEBOOK_DOMAINS = frozenset({'facebook.com', 'fb.watch', 'fb.com'})
+OTHER_VIDEO_DOMAINS = frozenset({
+    'instagram.com', 'tiktok.com', 'twitter.com', 'x.com', 't.co'
+})
+
+
+def host_in(host, domains):
+    """True if host is one of domains or a subdomain of one (a few set lookups)."""
+    labels = host.split('.')
+    return any('.'.join(labels[i:]) in domains for i in range(len(labels) - 1))
+
+
 def normalize_youtube_url(url):
     try:
         parsed = urlparse(url)
-        domain = parsed.netloc.replace('www.', '').replace('m.', '')
-        if 'youtube.com' in domain:
+        host = parsed.hostname or ''
+        if host in YOUTUBE_HOSTS:
             query = parse_qs(parsed.query)
             if 'v' in query:
                 return f"https://www.youtube.com/watch?v={query['v'][0]}"
             if '/shorts/' in parsed.path:
-                m = re.search(r'/shorts/([a-zA-Z0-9_-]+)', parsed.path)
+                m = SHORTS_RE.search(parsed.path)
                 if m:
                     return f"https://www.youtube.com/watch?v={m.group(1)}"
-        elif 'youtu.be' in domain:
+        elif host in YOUTU_BE_HOSTS:
             vid = parsed.path.strip('/')
             if vid:
                 return f"https://www.youtube.com/watch?v={vid}"
@@ -525,18 +1237,18 @@ def validate_url(url):
     """Return True if URL looks like a direct video link we support."""
     try:
         parsed = urlparse(url)
-        domain = parsed.netloc.replace('www.', '').replace('m.', '').replace('web.', '').lower()
+        host = parsed.hostname or ''
         path = parsed.path
 
         # YouTube
-        if domain in ['youtube.com', 'youtu.be']:
-            if domain == 'youtube.com':
-                query = parse_qs(parsed.query)
-                return 'v' in query or '/shorts/' in path or '/watch' in path
+        if host in YOUTUBE_HOSTS:
+            query = parse_qs(parsed.query)
+            return 'v' in query or '/shorts/' in path or '/watch' in path
+        if host in YOUTU_BE_HOSTS:
             return len(path.strip('/')) > 0
 
         # Facebook - block profile/home, allow watch/reel/videos
-        if 'facebook.com' in domain or domain in ['fb.watch', 'fb.com']:
+        if host_in(host, FACEBOOK_DOMAINS):
             if '/profile.php' in path and 'v=' not in parsed.query:
                 return False
             if path in ['', '/']:
@@ -546,11 +1258,8 @@ def validate_url(url):
             ]
             return any(p in url for p in valid_fb)
 
-        # Other platforms
-        if any(p in domain for p in [
-            'instagram.com', 'tiktok.com', 'vm.tiktok.com',
-            'twitter.com', 'x.com', 't.co'
-        ]):
+        # Other platforms (subdomains such as vm.tiktok.com included)
+        if host_in(host, OTHER_VIDEO_DOMAINS):
             return True
 
         return False
@@ -574,33 +1283,7 @@ def get_platform(url):
 
 
 # ================== Metadata Embedding ==================
-def embed_metadata_mp3_mutagen(mp3_path, metadata, thumbnail_path=None):
-    try:
-        audio = MP3(mp3_path, ID3=ID3)
-        if audio.tags:
-            audio.tags.delete()
-        audio.add_tags()
-        if metadata.get('title'):
-            audio.tags.add(TIT2(encoding=3, text=metadata['title']))
-        if metadata.get('artist'):
-            audio.tags.add(TPE1(encoding=3, text=metadata['artist']))
-        if metadata.get('year'):
-            audio.tags.add(TDRC(encoding=3, text=str(metadata['year'])))
-        if metadata.get('genre'):
-            audio.tags.add(TCON(encoding=3, text=metadata['genre']))
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            with open(thumbnail_path, 'rb') as f:
-                audio.tags.add(APIC(
-                    encoding=3, mime='image/jpeg', type=3, desc='', data=f.read()
-                ))
-        audio.save(v2_version=3)
-        return True
-    except Exception as e:
-        logger.error(f"[MP3-METADATA] {e}")
-        return False
-
-
-def embed_metadata_aac(m4a_path, metadata, thumbnail_path=None):
+def embed_metadata_aac(m4a_path, metadata, thumb_bytes=None):
     try:
         audio = MP4(m4a_path)
         if metadata.get('title'):
@@ -611,9 +1294,8 @@ def embed_metadata_aac(m4a_path, metadata, thumbnail_path=None):
             audio['\xa9day'] = str(metadata['year'])
         if metadata.get('genre'):
             audio['\xa9gen'] = metadata['genre']
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            with open(thumbnail_path, 'rb') as f:
-                audio['covr'] = [MP4Cover(f.read(), imageformat=MP4Cover.FORMAT_JPEG)]
+        if thumb_bytes:
+            audio['covr'] = [MP4Cover(thumb_bytes, imageformat=MP4Cover.FORMAT_JPEG)]
         audio.save()
         return True
     except Exception as e:
@@ -621,64 +1303,47 @@ def embed_metadata_aac(m4a_path, metadata, thumbnail_path=None):
         return False
 
 
-def embed_metadata_opus(opus_file, metadata, thumbnail_path=None):
+def build_vorbis_picture(thumb_bytes):
+    """METADATA_BLOCK_PICTURE value (base64 FLAC picture) for OPUS/OGG."""
+    picture = Picture()
+    picture.type = 3
+    picture.mime = 'image/jpeg'
+    picture.desc = 'Cover'
+    picture.data = thumb_bytes
+    # download_thumbnail always writes an ARTWORK_SIZE square RGB JPEG,
+    # so there is no need to decode it again for the dimensions
+    picture.width = picture.height = ARTWORK_SIZE
+    picture.depth = 24
+    return base64.b64encode(picture.write()).decode('ascii')
+
+
+def embed_vorbis_comments(audio, metadata, thumb_bytes=None):
+    """Fill Vorbis comments on an opened OggOpus/OggVorbis file and save."""
+    if metadata.get('title'):
+        audio['TITLE'] = metadata['title']
+    if metadata.get('artist'):
+        audio['ARTIST'] = metadata['artist']
+    if metadata.get('year'):
+        audio['DATE'] = str(metadata['year'])
+    if metadata.get('genre'):
+        audio['GENRE'] = metadata['genre']
+    if thumb_bytes:
+        audio['METADATA_BLOCK_PICTURE'] = build_vorbis_picture(thumb_bytes)
+    audio.save()
+
+
+def embed_metadata_opus(opus_file, metadata, thumb_bytes=None):
     try:
-        audio = OggOpus(opus_file)
-        if metadata.get('title'):
-            audio['TITLE'] = metadata['title']
-        if metadata.get('artist'):
-            audio['ARTIST'] = metadata['artist']
-        if metadata.get('year'):
-            audio['DATE'] = str(metadata['year'])
-        if metadata.get('genre'):
-            audio['GENRE'] = metadata['genre']
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            with open(thumbnail_path, 'rb') as f:
-                img_data = f.read()
-            picture = Picture()
-            picture.type = 3
-            picture.mime = 'image/jpeg'
-            picture.desc = 'Cover'
-            picture.data = img_data
-            img = Image.open(BytesIO(img_data))
-            picture.width, picture.height = img.size
-            picture.depth = 24
-            audio['METADATA_BLOCK_PICTURE'] = base64.b64encode(
-                picture.write()
-            ).decode('ascii')
-        audio.save()
+        embed_vorbis_comments(OggOpus(opus_file), metadata, thumb_bytes)
         return True
     except Exception as e:
         logger.error(f"[OPUS-METADATA] {e}")
         return False
 
 
-def embed_metadata_ogg(ogg_file, metadata, thumbnail_path=None):
+def embed_metadata_ogg(ogg_file, metadata, thumb_bytes=None):
     try:
-        audio = OggVorbis(ogg_file)
-        if metadata.get('title'):
-            audio['TITLE'] = metadata['title']
-        if metadata.get('artist'):
-            audio['ARTIST'] = metadata['artist']
-        if metadata.get('year'):
-            audio['DATE'] = str(metadata['year'])
-        if metadata.get('genre'):
-            audio['GENRE'] = metadata['genre']
-        if thumbnail_path and os.path.exists(thumbnail_path):
-            with open(thumbnail_path, 'rb') as f:
-                img_data = f.read()
-            picture = Picture()
-            picture.type = 3
-            picture.mime = 'image/jpeg'
-            picture.desc = 'Cover'
-            picture.data = img_data
-            img = Image.open(BytesIO(img_data))
-            picture.width, picture.height = img.size
-            picture.depth = 24
-            audio['METADATA_BLOCK_PICTURE'] = base64.b64encode(
-                picture.write()
-            ).decode('ascii')
-        audio.save()
+        embed_vorbis_comments(OggVorbis(ogg_file), metadata, thumb_bytes)
         return True
     except Exception as e:
         logger.error(f"[OGG-METADATA] {e}")
@@ -686,136 +1351,461 @@ def embed_metadata_ogg(ogg_file, metadata, thumbnail_path=None):
 
 
 # ================== Progress Hook ==================
+# Statuses a task can be in while yt-dlp is still fetching it (a video's
+# audio stream downloads after the video stream already reported
+# 'processing'). Anything else - cancelled, error, completed - is final.
+HOOK_STATUSES = frozenset({'initializing', 'connecting', 'starting', 'downloading', 'processing'})
+
+
 def progress_hook(d, task_id):
-    """Update conversion_progress with speed, eta, sizes (numeric + string)."""
+    """Update conversion_progress with speed, eta, sizes (numeric + string).
+
+    'downloading' callbacks are coalesced to one update per
+    PROGRESS_HOOK_INTERVAL, gated on the entry's own last_update, so the
+    task's progress_lock stripe is taken at most a few times a second.
+    The merge and rebind happen under it and are skipped once the task
+    has left HOOK_STATUSES, so a late callback can't undo cancel() or
+    the stall checker.
+    """
     try:
-        with progress_lock:
-            if task_id not in conversion_progress:
-                return
+        cur = conversion_progress.get(task_id)
+        if cur is None or cur.get('status') not in HOOK_STATUSES:
+            return
 
-            # Always update timestamp
-            conversion_progress[task_id]['last_update'] = time.time()
+        now = time.monotonic()
+        if (d['status'] == 'downloading' and cur.get('status') == 'downloading'
+                and now - cur.get('last_update', 0) < PROGRESS_HOOK_INTERVAL):
+            return
 
-            if d['status'] == 'downloading':
-                total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
-                downloaded = d.get('downloaded_bytes', 0)
+        update = {'last_update': now}
 
-                # Raw numeric speed (bytes/s) - may be None
-                raw_speed = d.get('speed') or 0
-                # Human readable speed from yt-dlp, e.g. "1.23MiB/s"
-                speed_str = d.get('_speed_str') or ''
+        # Adding to the task's set under task_files_lock is idempotent, and
+        # the coalescing above keeps this to a few calls a second
+        for key in ('tmpfilename', 'filename'):
+            register_task_file(task_id, d.get(key))
 
-                # ETA in seconds
-                eta = d.get('eta') or 0
+        if d['status'] == 'downloading':
+            total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
+            downloaded = d.get('downloaded_bytes', 0)
 
-                # Compute percent
-                if total > 0:
-                    percent = min((downloaded / total) * 85, 85)
-                else:
-                    percent = min(conversion_progress[task_id].get('percent', 5) + 0.3, 85)
+            # Raw numeric speed (bytes/s) - may be None
+            raw_speed = d.get('speed') or 0
+            # Human readable speed from yt-dlp, e.g. "1.23MiB/s"
+            speed_str = d.get('_speed_str') or ''
 
-                # Build message
-                downloaded_mb = downloaded / (1024 * 1024) if downloaded else 0
-                total_mb = total / (1024 * 1024) if total else 0
+            # ETA in seconds
+            eta = d.get('eta') or 0
 
-                if total_mb > 0:
-                    msg = f"Downloading... {int(percent)}% ({downloaded_mb:.1f}/{total_mb:.1f} MB)"
-                else:
-                    msg = f"Downloading... {int(percent)}%"
-
-                # Append speed to message if available
-                if speed_str:
-                    msg += f" @ {speed_str}"
+            # Compute percent
+            if total > 0:
+                percent = min((downloaded / total) * 85, 85)
+            else:
+                percent = min(cur.get('percent', 5) + 0.3, 85)
 
-                # Store everything in progress dict
-                conversion_progress[task_id].update({
-                    'status': 'downloading',
-                    'percent': percent,
-                    'speed': raw_speed,          # numeric bytes/s
-                    'speed_str': speed_str,      # human readable, e.g. "1.23MiB/s"
-                    'eta': eta,
-                    'downloaded_bytes': downloaded,
-                    'total_bytes': total,
-                    'message': msg
-                })
+            # Build message
+            downloaded_mb = downloaded / (1024 * 1024) if downloaded else 0
+            total_mb = total / (1024 * 1024) if total else 0
 
-            elif d['status'] == 'finished':
-                conversion_progress[task_id].update({
-                    'status': 'processing',
-                    'percent': 87,
-                    'message': 'Download complete. Processing...',
-                    'speed': 0,
-                    'speed_str': '',
-                    'eta': 0
-                })
+            if total_mb > 0:
+                msg = f"Downloading... {int(percent)}% ({downloaded_mb:.1f}/{total_mb:.1f} MB)"
+            else:
+                msg = f"Downloading... {int(percent)}%"
+
+            # Append speed to message if available
+            if speed_str:
+                msg += f" @ {speed_str}"
+
+            update.update({
+                'status': 'downloading',
+                'percent': percent,
+                'speed': raw_speed,          # numeric bytes/s
+                'speed_str': speed_str,      # human readable, e.g. "1.23MiB/s"
+                'eta': eta,
+                'downloaded_bytes': downloaded,
+                'total_bytes': total,
+                'message': msg
+            })
+
+        elif d['status'] == 'finished':
+            update.update({
+                'status': 'processing',
+                'percent': 87,
+                'message': 'Download complete. Processing...',
+                'speed': 0,
+                'speed_str': '',
+                'eta': 0
+            })
+
+        with progress_lock(task_id):
+            cur = conversion_progress.get(task_id)
+            if cur is None or cur.get('status') not in HOOK_STATUSES:
+                return
+            conversion_progress[task_id] = {**cur, **update}
 
     except Exception as e:
         logger.error(f"[PROGRESS] Error: {e}")
 
 
+_QUALITY_THRESHOLDS = ((1080, '1080p'), (720, '720p'), (480, '480p'), (360, '360p'), (144, '144p'))
+_QUALITY_ORDER = ('best',) + tuple(q for _, q in _QUALITY_THRESHOLDS)
+
+
 def get_available_formats(info):
-    formats = info.get('formats', [])
-    available = set(['best'])
-    for f in formats:
+    available = {'best'}
+    for f in info.get('formats', []):
         h = f.get('height')
         if h:
-            if h >= 1080:
-                available.add('1080p')
-            elif h >= 720:
-                available.add('720p')
-            elif h >= 480:
-                available.add('480p')
-            elif h >= 360:
-                available.add('360p')
-            elif h >= 144:
-                available.add('144p')
-    return sorted(
-        list(available),
-        key=lambda x: int(x.replace('p', '').replace('best', '9999')),
-        reverse=True
-    )
-
-
-def get_base_ydl_opts():
-    opts = {
-        'quiet': True,
-        'no_warnings': True,
-        'noplaylist': True,
-        'nocheckcertificate': True,
-        'geo_bypass': True,
-        'socket_timeout': 60,
-        'retries': 10,
-        'fragment_retries': 10,
-        'file_access_retries': 5,
-        'extractor_retries': 5,
-        'ignoreerrors': False,
-        'user_agent': (
+            for min_height, quality in _QUALITY_THRESHOLDS:
+                if h >= min_height:
+                    available.add(quality)
+                    break
+    return [q for q in _QUALITY_ORDER if q in available]
+
+
+BASE_YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'noplaylist': True,
+    'nocheckcertificate': True,
+    'geo_bypass': True,
+    'socket_timeout': 60,
+    'retries': 10,
+    'fragment_retries': 10,
+    'file_access_retries': 5,
+    'extractor_retries': 5,
+    'ignoreerrors': False,
+    'user_agent': (
+        'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
+        'AppleWebKit/537.36 (KHTML, like Gecko) '
+        'Chrome/120.0.0.0 Safari/537.36'
+    ),
+    'http_headers': {
+        'User-Agent': (
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
             'AppleWebKit/537.36 (KHTML, like Gecko) '
             'Chrome/120.0.0.0 Safari/537.36'
         ),
-        'http_headers': {
-            'User-Agent': (
-                'Mozilla/5.0 (Windows NT 10.0; Win64; x64) '
-                'AppleWebKit/537.36 (KHTML, like Gecko) '
-                'Chrome/120.0.0.0 Safari/537.36'
-            ),
-            'Accept':
-                'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-            'Accept-Language': 'en-US,en;q=0.9',
-        },
-        'http_chunk_size': 10485760,
-        'prefer_ffmpeg': True,
-        'concurrent_fragment_downloads': 4
-    }
+        'Accept':
+            'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+        'Accept-Language': 'en-US,en;q=0.9',
+    },
+    # 10 MiB ranged requests stay under YouTube's per-request throttling
+    'http_chunk_size': 10485760,
+    'buffersize': 1024 * 1024,
+    'prefer_ffmpeg': True,
+    'concurrent_fragment_downloads': 4,
+    # Keep yt-dlp's player/signature cache across requests and restarts
+    'cachedir': os.path.join(CACHE_FOLDER, 'yt-dlp'),
+}
+
+COOKIES_FILE = 'cookies.txt'
+COOKIES_RECHECK = 60           # seconds between cookies.txt existence checks
+cookies_state = {'present': os.path.exists(COOKIES_FILE), 'checked_at': time.monotonic()}
 
-    # Optional cookies for Facebook if present
-    if os.path.exists('cookies.txt'):
-        opts['cookiefile'] = 'cookies.txt'
+
+def get_base_ydl_opts():
+    """Fresh copy of BASE_YDL_OPTS (callers add per-job keys to it)."""
+    opts = dict(BASE_YDL_OPTS)
+    opts['http_headers'] = dict(BASE_YDL_OPTS['http_headers'])
+
+    # Optional cookies for Facebook if present; stat at most once a minute
+    now = time.monotonic()
+    if now - cookies_state['checked_at'] > COOKIES_RECHECK:
+        cookies_state['present'] = os.path.exists(COOKIES_FILE)
+        cookies_state['checked_at'] = now
+    if cookies_state['present']:
+        opts['cookiefile'] = COOKIES_FILE
 
     return opts
 
 
+def get_info_only_ydl_opts():
+    """Base options trimmed for metadata lookups that never download.
+
+    Skips the watch page, player configs and DASH/HLS manifests. Player JS
+    is still fetched: available_qualities needs the format heights.
+    """
+    opts = get_base_ydl_opts()
+    opts['skip_download'] = True
+    opts['ignore_no_formats_error'] = True
+    opts['youtube_include_dash_manifest'] = False
+    opts['youtube_include_hls_manifest'] = False
+    opts['extractor_args'] = {'youtube': {'player_skip': ['webpage', 'configs']}}
+    return opts
+
+
+# ================== FFmpeg Command Builders ==================
+def build_video_input_args(codec):
+    """Input-side ffmpeg options for the chosen H.264 encoder."""
+    if codec == 'h264_nvenc':
+        # Decode on the GPU too; frames come back to system memory so the
+        # regular scale filter still applies.
+        return ['-hwaccel', 'cuda']
+    if codec == 'h264_vaapi':
+        return ['-vaapi_device', VAAPI_DEVICE]
+    return []
+
+
+def build_video_output_args(quality, codec=None, copy_audio=False):
+    """ffmpeg output options for one QuickTime-compatible MP4 rendition.
+
+    The caller appends the output path. Several groups can follow a single
+    '-i' so one decode feeds every requested rendition. codec overrides
+    the probed encoder (e.g. 'libx264' for the CPU fallback); copy_audio
+    keeps a source AAC track as is (see can_copy_audio).
+    """
+    encode_cfg = VIDEO_ENCODE_SETTINGS.get(quality, VIDEO_ENCODE_SETTINGS['best'])
+    codec = codec or encode_cfg.get('codec', 'libx264')
+    crf = encode_cfg['crf']
+
+    args = ['-map', '0:v:0', '-map', '0:a:0?']
+
+    if codec == 'h264_nvenc':
+        args.extend([
+            '-c:v', 'h264_nvenc',
+            '-preset', 'p4',
+            '-tune', 'hq',
+            '-rc', 'vbr',
+            '-cq', crf,
+            '-b:v', '0',  # pure constant quality, capped by -maxrate below
+            '-profile:v', 'high',
+            '-pix_fmt', 'yuv420p'
+        ])
+    elif codec == 'h264_qsv':
+        args.extend([
+            '-c:v', 'h264_qsv',
+            '-preset', 'veryfast',  # fixed-function path; slower presets gain little at this QP
+            '-global_quality', crf,
+            '-profile:v', 'high',
+            '-pix_fmt', 'nv12'
+        ])
+    elif codec == 'h264_amf':
+        args.extend([
+            '-c:v', 'h264_amf',
+            '-quality', 'balanced',
+            '-rc', 'cqp',
+            '-qp_i', crf,
+            '-qp_p', crf,
+            '-profile:v', 'high',
+            '-pix_fmt', 'yuv420p'
+        ])
+    elif codec == 'h264_vaapi':
+        args.extend([
+            '-c:v', 'h264_vaapi',
+            '-qp', crf,
+            '-profile:v', 'high'
+        ])
+    elif codec == 'h264_videotoolbox':
+        # No CRF equivalent across macOS versions; target the rate cap
+        args.extend([
+            '-c:v', 'h264_videotoolbox',
+            '-b:v', encode_cfg['maxrate'] or '8000k',
+            '-profile:v', 'high',
+            '-pix_fmt', 'yuv420p'
+        ])
+    else:
+        args.extend([
+            '-c:v', 'libx264',
+            '-preset', 'medium',
+            '-profile:v', 'high',
+            '-level', '4.0',
+            '-pix_fmt', 'yuv420p',
+            '-crf', crf,
+            '-threads', str(FFMPEG_THREADS)
+        ])
+
+    if copy_audio:
+        args.extend(['-c:a', 'copy'])
+    else:
+        args.extend([
+            '-c:a', 'aac',
+            '-b:a', '192k',
+            '-ar', '48000',
+            '-ac', '2'
+        ])
+    args.extend([
+        '-movflags', '+faststart',
+        '-f', 'mp4'
+    ])
+
+    filters = []
+    if encode_cfg['scale']:
+        filters.append(f"scale={encode_cfg['scale']}")
+    if codec == 'h264_vaapi':
+        filters.append('format=nv12,hwupload')
+    if filters:
+        args.extend(['-vf', ','.join(filters)])
+
+    # VAAPI and AMF run constant-QP here and VideoToolbox is bitrate-driven,
+    # so none of them take the VBV caps
+    if (codec not in ('h264_vaapi', 'h264_amf', 'h264_videotoolbox')
+            and encode_cfg['maxrate'] and encode_cfg['bufsize']):
+        args.extend(['-maxrate', encode_cfg['maxrate'], '-bufsize', encode_cfg['bufsize']])
+
+    return args
+
+
+def build_mp3_cmd(input_path, output_path, metadata, cover_path=None):
+    """Encode a tagged MP3 in one pass: ID3v2.3 text frames plus APIC cover.
+
+    Source tags are dropped (-map_metadata -1) so only ours end up in the file.
+    """
+    cfg = AUDIO_FORMATS['mp3']
+    cmd = ['ffmpeg', '-y', '-i', input_path]
+    if cover_path:
+        cmd.extend(['-i', cover_path])
+    cmd.extend(['-map', '0:a:0'])
+    if cover_path:
+        cmd.extend([
+            '-map', '1:v:0',
+            '-c:v', 'copy',
+            '-disposition:v', 'attached_pic',
+            '-metadata:s:v', 'title=Album cover',
+            '-metadata:s:v', 'comment=Cover (front)'
+        ])
+    cmd.extend([
+        '-c:a', cfg['codec'],
+        '-b:a', cfg['bitrate'],
+        '-ar', cfg['sample_rate'],
+        '-ac', '2',
+        '-threads', str(FFMPEG_THREADS),
+        '-map_metadata', '-1',
+        '-id3v2_version', '3',
+        '-write_id3v1', '0'
+    ])
+    tags = {
+        'title': metadata.get('title'),
+        'artist': metadata.get('artist'),
+        'date': metadata.get('year'),
+        'genre': metadata.get('genre'),
+    }
+    for key, value in tags.items():
+        if value:
+            cmd.extend(['-metadata', f'{key}={value}'])
+    cmd.extend(['-f', 'mp3', output_path])
+    return cmd
+
+
+def build_multi_output_cmd(input_path, outputs, input_args=()):
+    """One ffmpeg argv that decodes input_path once and writes every output.
+
+    outputs is a list of (output_args, output_path) pairs.
+    """
+    cmd = ['ffmpeg', '-y', *input_args, '-i', input_path]
+    for output_args, output_path in outputs:
+        cmd.extend(output_args)
+        cmd.append(output_path)
+    return cmd
+
+
+def probe_media(path):
+    """ffprobe container and stream info as a dict, or None on failure."""
+    try:
+        out = subprocess.run(
+            ['ffprobe', '-v', 'error',
+             '-show_entries', 'stream=codec_type,codec_name,pix_fmt,height,channels',
+             '-of', 'json', path],
+            capture_output=True, text=True, timeout=30
+        )
+        if out.returncode != 0:
+            return None
+        return json.loads(out.stdout)
+    except Exception as e:
+        logger.warning(f"[FFPROBE] {e}")
+        return None
+
+
+def can_stream_copy(probe, quality):
+    """True when the download is already H.264/AAC within the target height.
+
+    Such files only need remuxing into a faststart MP4, not a re-encode. The
+    source container doesn't matter (MKV/TS/FLV copy into MP4 just the same;
+    ffmpeg inserts aac_adtstoasc for ADTS audio itself).
+    """
+    if not probe:
+        return False
+    streams = probe.get('streams', [])
+    video = [st for st in streams if st.get('codec_type') == 'video']
+    audio = [st for st in streams if st.get('codec_type') == 'audio']
+    if not video or video[0].get('codec_name') != 'h264' or video[0].get('pix_fmt') != 'yuv420p':
+        return False
+    if audio and audio[0].get('codec_name') != 'aac':
+        return False
+    scale = VIDEO_ENCODE_SETTINGS.get(quality, VIDEO_ENCODE_SETTINGS['best'])['scale']
+    if scale and (video[0].get('height') or 0) > int(scale.split(':')[1]):
+        return False
+    return True
+
+
+def can_copy_audio(probe):
+    """True when the first audio track is mono/stereo AAC, fine for MP4 as is."""
+    audio = [st for st in (probe or {}).get('streams', []) if st.get('codec_type') == 'audio']
+    return bool(audio) and audio[0].get('codec_name') == 'aac' and 0 < (audio[0].get('channels') or 0) <= 2
+
+
+def build_remux_output_args():
+    """Output options that stream-copy into a faststart MP4 (no encode)."""
+    return [
+        '-map', '0:v:0', '-map', '0:a:0?',
+        '-c', 'copy',
+        # Copied TS/WebM streams can start at a non-zero or negative
+        # timestamp; start them at 0 so QuickTime doesn't need an edit list
+        '-avoid_negative_ts', 'make_zero',
+        '-movflags', '+faststart',
+        '-f', 'mp4'
+    ]
+
+
+# ================== yt-dlp Info Pool ==================
+# Building a YoutubeDL loads every extractor, which dominates cold
+# /api/video-info latency. Keep warm info-only instances around and hand
+# each one to a single thread at a time; download instances stay per-task
+# since their progress hook is task-bound.
+# Entries are (ydl, uses). An instance is closed, not returned, once it
+# has served INFO_YDL_MAX_USES lookups or the pool already holds
+# INFO_YDL_POOL_SIZE idle ones, so cookie jars and HTTP handlers don't
+# pile up for the life of the process.
+info_ydl_pool = queue.LifoQueue(maxsize=INFO_YDL_POOL_SIZE)
+
+
+def close_info_ydl(ydl):
+    try:
+        ydl.close()
+    except Exception as e:
+        logger.warning(f"[YDL POOL] Close failed: {e}")
+
+
+@contextmanager
+def pooled_info_ydl():
+    try:
+        ydl, uses = info_ydl_pool.get_nowait()
+    except queue.Empty:
+        ydl, uses = yt_dlp.YoutubeDL(get_info_only_ydl_opts()), 0
+    try:
+        yield ydl
+    finally:
+        uses += 1
+        kept = False
+        if uses < INFO_YDL_MAX_USES:
+            try:
+                info_ydl_pool.put_nowait((ydl, uses))
+                kept = True
+            except queue.Full:
+                pass
+        if not kept:
+            close_info_ydl(ydl)
+
+
+@atexit.register
+def close_info_ydl_pool():
+    while True:
+        try:
+            ydl, _ = info_ydl_pool.get_nowait()
+        except queue.Empty:
+            return
+        close_info_ydl(ydl)
+
+
 # ================== Routes ==================
 
 @app.route('/')
@@ -825,25 +1815,63 @@ def index():
 
 @app.route('/api/thumbnail/<thumb_id>')
 def thumbnail_proxy(thumb_id):
-    """Serve cached or on-demand thumbnail bytes."""
+    """Serve cached or on-demand thumbnail bytes.
+
+    thumb_id is derived from the source URL, so a response never changes:
+    the ETag is the id itself and clients may cache it for a year.
+    """
+    if thumb_id in request.if_none_match:
+        resp = Response(status=304)
+        resp.set_etag(thumb_id)
+        return resp
+
     with thumbnail_cache_lock:
-        cached = thumbnail_cache.get(thumb_id)
+        cached = thumbnail_cache.get_fresh(thumb_id)
 
     if not cached:
         return Response('Not found', status=404)
 
-    img_data = cached.get('data')
-    if not img_data:
-        url = cached.get('url')
-        img_data = fetch_thumbnail_bytes(url)
-        if img_data:
-            with thumbnail_cache_lock:
-                thumbnail_cache[thumb_id]['data'] = img_data
+    img_data = cached.data
+    if not img_data and not cached.path:
+        try:
+            img_data = fetch_thumbnail_async(thumb_id, cached.url).result(timeout=12)
+        except Exception as e:
+            logger.warning(f"[THUMB PROXY] {thumb_id}: {e}")
+            img_data = None
+
+    # Files go out via send_file so the server can use sendfile(2)
+    path = cached.path
+    if path and os.path.exists(path):
+        resp = send_file(os.path.abspath(path), mimetype='image/jpeg', etag=thumb_id,
+                         max_age=THUMBNAIL_MAX_AGE)
+        resp.cache_control.public = True
+        resp.cache_control.immutable = True
+        return resp
 
     if not img_data:
-        return Response('Failed', status=500)
-
-    return Response(img_data, mimetype='image/jpeg')
+        # Let the browser try the origin rather than show a broken image
+        return redirect(cached.url, code=302)
+
+    resp = Response(img_data, mimetype='image/jpeg')
+    resp.set_etag(thumb_id)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = THUMBNAIL_MAX_AGE
+    resp.cache_control.immutable = True
+    return resp
+
+
+def video_info_response(result, etag):
+    """JSON video info with an ETag; 304 when the client already has it."""
+    # flask-compress appends ':gzip'/':br' to the ETag it sends out
+    client_tags = {t.split(':', 1)[0] for t in request.if_none_match.as_set()}
+    if etag in client_tags:
+        resp = Response(status=304)
+    else:
+        resp = jsonify(result)
+    resp.set_etag(etag)
+    resp.cache_control.public = True
+    resp.cache_control.max_age = VIDEO_INFO_CACHE_TTL
+    return resp
 
 
 @app.route('/api/video-info', methods=['POST'])
@@ -859,19 +1887,17 @@ def video_info():
     if not validate_url(url):
         return jsonify({'error': 'Unsupported or invalid URL'}), 400
 
-    url_hash = hashlib.md5(url.encode()).hexdigest()
+    # The normalized URL is already a good dict key; no need to hash it first
+    cache_key = url
     with cache_lock:
-        if url_hash in video_info_cache:
-            cached = video_info_cache[url_hash]
-            if time.time() - cached['cached_at'] < 300:
-                return jsonify(cached['data'])
+        cached = video_info_cache.get_fresh(cache_key)
+    if cached:
+        return video_info_response(cached['data'], cached['etag'])
 
     try:
         platform = get_platform(url)
-        ydl_opts = get_base_ydl_opts()
-        ydl_opts['skip_download'] = True
 
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with pooled_info_ydl() as ydl:
             info = ydl.extract_info(url, download=False)
             if info.get('_type') == 'playlist' and info.get('entries'):
                 info = info['entries'][0]
@@ -883,13 +1909,9 @@ def video_info():
             }), 400
 
         if duration:
-            td = str(timedelta(seconds=duration))
-            if duration >= 3600:
-                duration_formatted = td
-            else:
-                # strip hours if 0
-                h, m, s = duration // 3600, (duration % 3600) // 60, duration % 60
-                duration_formatted = f"{m}:{s:02d}"
+            h, rem = divmod(int(duration), 3600)
+            m, s = divmod(rem, 60)
+            duration_formatted = f"{h}:{m:02d}:{s:02d}" if h else f"{m}:{s:02d}"
         else:
             duration_formatted = 'Unknown'
 
@@ -897,17 +1919,15 @@ def video_info():
         artist = extract_clean_artist(info)
         thumb_url = get_best_thumbnail(info)
 
-        # Proxy thumbnails for some platforms
+        # Proxy thumbnails for some platforms. The fetch runs in the
+        # background; /api/thumbnail waits on it if the browser asks first.
         if platform in ['Facebook', 'Instagram', 'TikTok'] and thumb_url:
-            thumb_id = hashlib.md5(thumb_url.encode()).hexdigest()[:16]
-            img_data = fetch_thumbnail_bytes(thumb_url)
+            thumb_id = hashlib.blake2b(thumb_url.encode(), digest_size=8).hexdigest()
             with thumbnail_cache_lock:
-                thumbnail_cache[thumb_id] = {
-                    'url': thumb_url,
-                    'data': img_data,
-                    'time': time.time()
-                }
-            thumb_url = f"/api/thumbnail/{thumb_id}" if img_data else ''
+                if thumbnail_cache.get_fresh(thumb_id) is None:
+                    thumbnail_cache.set(thumb_id, ThumbEntry(thumb_url))
+            fetch_thumbnail_async(thumb_id, thumb_url)
+            thumb_url = f"/api/thumbnail/{thumb_id}"
 
         result = {
             'success': True,
@@ -920,69 +1940,99 @@ def video_info():
             'available_qualities': get_available_formats(info) if info.get('formats') else ['best']
         }
 
+        etag = hashlib.blake2b(
+            json.dumps(result, sort_keys=True).encode(), digest_size=8
+        ).hexdigest()
         with cache_lock:
-            video_info_cache[url_hash] = {
-                'data': result,
-                'cached_at': time.time()
-            }
-            if len(video_info_cache) > 100:
-                oldest = min(
-                    video_info_cache.keys(),
-                    key=lambda k: video_info_cache[k]['cached_at']
-                )
-                video_info_cache.pop(oldest, None)
+            video_info_cache.set(cache_key, {'data': result, 'etag': etag})
 
-        return jsonify(result)
+        return video_info_response(result, etag)
     except Exception as e:
         logger.error(f"[INFO] Error: {e}")
         return jsonify({'error': 'Could not fetch video info'}), 400
 
 
+# Static lists: serialised once at import, served with a long cache lifetime
+AUDIO_FORMATS_JSON = json.dumps({
+    'formats': [
+        {
+            'id': fid,
+            'name': cfg['name'],
+            'quality': cfg['quality'],
+            'description': cfg['description'],
+            'extension': cfg['extension'],
+            'icon': cfg['icon'],
+            'recommended': cfg.get('recommended', False)
+        }
+        for fid, cfg in AUDIO_FORMATS.items()
+    ]
+}).encode()
+
+SUPPORTED_PLATFORMS_JSON = json.dumps({
+    'platforms': [
+        {'name': 'YouTube',   'icon': 'fab fa-youtube',   'color': '#FF0000'},
+        {'name': 'Facebook',  'icon': 'fab fa-facebook',  'color': '#1877F2'},
+        {'name': 'Instagram', 'icon': 'fab fa-instagram', 'color': '#E4405F'},
+        {'name': 'TikTok',    'icon': 'fab fa-tiktok',    'color': '#000000'},
+        {'name': 'Twitter/X', 'icon': 'fab fa-twitter',   'color': '#1DA1F2'},
+    ]
+}).encode()
+
+
+def static_json_response(body):
+    resp = Response(body, mimetype='application/json')
+    resp.cache_control.public = True
+    resp.cache_control.max_age = 86400
+    return resp
+
+
 @app.route('/api/audio-formats')
 def audio_formats():
-    return jsonify({
-        'formats': [
-            {
-                'id': fid,
-                'name': cfg['name'],
-                'quality': cfg['quality'],
-                'description': cfg['description'],
-                'extension': cfg['extension'],
-                'icon': cfg['icon'],
-                'recommended': cfg.get('recommended', False)
-            }
-            for fid, cfg in AUDIO_FORMATS.items()
-        ]
-    })
+    return static_json_response(AUDIO_FORMATS_JSON)
 
 
-@app.route('/api/convert', methods=['POST'])
-@limiter.limit("20 per minute")
-def convert():
-    data = request.get_json() or {}
-    url = data.get('url', '').strip()
+def start_conversion(data):
+    """Validate one convert request and start its worker thread.
+
+    Returns (task_id, None) on success or (None, error message).
+    """
+    url = (data.get('url') or '').strip()
     format_type = data.get('format', 'audio')
     quality = data.get('quality', 'best')
     audio_format = data.get('audioFormat', 'mp3')
 
     if not url:
-        return jsonify({'error': 'URL is required'}), 400
+        return None, 'URL is required'
 
     url = normalize_youtube_url(url)
     if not validate_url(url):
-        return jsonify({'error': 'Unsupported or invalid URL'}), 400
+        return None, 'Unsupported or invalid URL'
 
     if format_type == 'audio' and audio_format not in AUDIO_FORMATS:
         audio_format = 'mp3'
 
+    # Optional extra video renditions, encoded in the same ffmpeg run so the
+    # source is decoded once for all of them. The download is picked for the
+    # main quality, so only lower ones are accepted.
+    qualities = data.get('qualities') or []
+    if not isinstance(qualities, list):
+        return None, 'qualities must be a list'
+    extra_qualities = []
+    if format_type == 'video' and quality in _QUALITY_ORDER:
+        lower = _QUALITY_ORDER[_QUALITY_ORDER.index(quality) + 1:]
+        for q in qualities:
+            if q in lower and q in VIDEO_ENCODE_SETTINGS and q not in extra_qualities:
+                extra_qualities.append(q)
+
     task_id = str(uuid.uuid4())
-    with progress_lock:
+    with progress_lock(task_id):
         conversion_progress[task_id] = {
             'status': 'initializing',
             'percent': 1,
             'message': 'Preparing download...',
-            'last_update': time.time()
+            'last_update': time.monotonic()
         }
+    schedule_stall_check(task_id, time.monotonic() + STALL_TIMEOUT)
 
     logger.info(f"[CONVERT] Start {task_id[:8]} - {format_type}/{audio_format if format_type=='audio' else quality}")
 
@@ -991,64 +2041,52 @@ def convert():
 
     def run_conversion():
         acquired = False
-        start_time = time.time()
+        start_time = time.monotonic()
         title = 'download'
         artist = 'Unknown'
         video_duration = 0
+        renditions = {}  # extra video quality -> filename
 
         try:
             acquired = active_downloads.acquire(timeout=120)
             if not acquired:
                 raise Exception("Server busy. Too many concurrent downloads, try again.")
 
-            with progress_lock:
+            with progress_lock(task_id):
                 conversion_progress[task_id].update({
                     'status': 'connecting',
                     'percent': 3,
                     'message': 'Connecting...',
-                    'last_update': time.time()
+                    'last_update': time.monotonic()
                 })
 
-            # Pre-fetch info to get duration + clean title/artist
-            try:
-                info_opts = get_base_ydl_opts()
-                info_opts['skip_download'] = True
-                with yt_dlp.YoutubeDL(info_opts) as ydl:
-                    pre_info = ydl.extract_info(url, download=False)
-                    if pre_info.get('_type') == 'playlist' and pre_info.get('entries'):
-                        pre_info = pre_info['entries'][0]
-                    video_duration = pre_info.get('duration', 0)
-                    title = extract_clean_title(pre_info)
-                    artist = extract_clean_artist(pre_info)
-            except Exception as e:
-                logger.warning(f"[CONVERT] Pre-info error: {e}")
-                title = 'download'
-                artist = 'Unknown'
-                video_duration = 3600
-
-            download_timeout = calculate_timeout(video_duration)
-            ffmpeg_timeout = calculate_ffmpeg_timeout(video_duration)
-
             ydl_opts = get_base_ydl_opts()
 
+            # Duration arrives with the first progress callback; until then
+            # the download runs under the generic DOWNLOAD_TIMEOUT.
+            hook_duration = [0]
+
             def ph(d):
+                if not hook_duration[0]:
+                    hook_duration[0] = (d.get('info_dict') or {}).get('duration') or 0
                 progress_hook(d, task_id)
 
             ydl_opts['progress_hooks'] = [ph]
             ydl_opts['outtmpl'] = output_path + '.%(ext)s'
 
             if format_type == 'audio':
-                ydl_opts['format'] = 'bestaudio[ext=m4a]/bestaudio/best'
+                ydl_opts['format'] = AUDIO_FORMATS[audio_format].get(
+                    'download_format', 'bestaudio[ext=m4a]/bestaudio/best')
             else:
                 ydl_opts['format'] = VIDEO_QUALITIES.get(quality, VIDEO_QUALITIES['best'])
                 ydl_opts['merge_output_format'] = 'mp4'
 
-            with progress_lock:
+            with progress_lock(task_id):
                 conversion_progress[task_id].update({
                     'status': 'starting',
                     'percent': 5,
                     'message': 'Starting download...',
-                    'last_update': time.time()
+                    'last_update': time.monotonic()
                 })
 
             # Run download in a thread with timeout
@@ -1068,8 +2106,13 @@ def convert():
             t = threading.Thread(target=dl_thread, daemon=True)
             t.start()
 
-            if not download_done.wait(timeout=download_timeout):
-                raise Exception(f"Download timed out after {download_timeout//60} minutes.")
+            download_started = time.monotonic()
+            download_timeout = DOWNLOAD_TIMEOUT
+            while not download_done.wait(timeout=5):
+                if hook_duration[0]:
+                    download_timeout = calculate_timeout(hook_duration[0])
+                if time.monotonic() - download_started > download_timeout:
+                    raise Exception(f"Download timed out after {download_timeout//60} minutes.")
 
             if download_error[0]:
                 raise Exception(download_error[0])
@@ -1077,31 +2120,34 @@ def convert():
             info = info_data[0]
             if not info:
                 raise Exception("Failed to get video info from yt-dlp")
+            if info.get('_type') == 'playlist' and info.get('entries'):
+                info = info['entries'][0]
+
+            # Title/artist/duration come from the download pass itself; no
+            # separate info-only extraction round-trip.
+            video_duration = info.get('duration') or 0
+            title = extract_clean_title(info)
+            artist = extract_clean_artist(info)
+            ffmpeg_timeout = calculate_ffmpeg_timeout(video_duration)
 
-            with progress_lock:
+            with progress_lock(task_id):
                 conversion_progress[task_id].update({
                     'status': 'processing',
                     'percent': 86,
                     'message': 'Download complete. Locating file...',
-                    'last_update': time.time()
+                    'last_update': time.monotonic()
                 })
 
-            # Find downloaded file
-            downloaded_file = None
-            for ext in ['.mp4', '.m4a', '.mp3', '.webm', '.mkv', '.opus', '.ogg', '.wav', '.flac']:
-                p = output_path + ext
-                if os.path.exists(p):
-                    downloaded_file = p
-                    break
+            # yt-dlp reports the final path (after merge/fixup) itself; scan
+            # the folder only if it is missing.
+            requested = info.get('requested_downloads') or [{}]
+            downloaded_file = requested[-1].get('filepath')
+            if not downloaded_file or not os.path.isfile(downloaded_file):
+                downloaded_file = find_task_file(task_id, DOWNLOADED_EXT_PRIORITY)
             if not downloaded_file:
-                for fname in os.listdir(DOWNLOAD_FOLDER):
-                    if fname.startswith(task_id):
-                        downloaded_file = os.path.join(DOWNLOAD_FOLDER, fname)
-                        break
-
-            if not downloaded_file or not os.path.exists(downloaded_file):
                 raise Exception("Downloaded file not found")
 
+            register_task_file(task_id, downloaded_file)
             file_size = os.path.getsize(downloaded_file)
             logger.info(f"[CONVERT] Downloaded: {downloaded_file} ({file_size/(1024*1024):.1f} MB)")
 
@@ -1110,48 +2156,36 @@ def convert():
                 cfg = AUDIO_FORMATS[audio_format]
                 ext = cfg['extension']
 
-                with progress_lock:
+                with progress_lock(task_id):
                     conversion_progress[task_id].update({
                         'status': 'processing',
                         'percent': 88,
                         'message': f'Converting to {cfg["name"]}...',
-                        'last_update': time.time()
+                        'last_update': time.monotonic()
                     })
 
-                audio_temp = output_path + f'_temp.{ext}'
-
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-i', downloaded_file,
-                    '-vn',
-                    '-c:a', cfg['codec'],
-                    '-b:a', cfg['bitrate'],
-                    '-ar', cfg['sample_rate'],
-                    '-ac', '2',
-                    audio_temp
-                ]
-
-                success, error = run_ffmpeg_with_progress(cmd, task_id, timeout=ffmpeg_timeout, stage="processing")
-                if not success or not os.path.exists(audio_temp):
-                    raise Exception(f"Audio conversion failed: {error[:150] if error else 'unknown error'}")
-
-                # Thumbnail for artwork
-                thumb_ok = False
-                try:
-                    with progress_lock:
-                        conversion_progress[task_id].update({
-                            'status': 'processing',
-                            'percent': 92,
-                            'message': 'Downloading artwork...',
-                            'last_update': time.time()
-                        })
-                    thumb_url = get_best_thumbnail(info)
-                    if thumb_url:
-                        thumb_ok = download_thumbnail(thumb_url, thumbnail_path)
-                except Exception as e:
-                    logger.error(f"[THUMB] {e}")
-
-                final_audio = output_path + f'.{ext}'
+                # Artwork downloads alongside the encode. MP3 writes it in the
+                # same ffmpeg pass as the audio, so that path waits for it first.
+                # Only the MP3 encode needs the artwork as a file; the other
+                # formats embed the returned bytes directly.
+                thumb_future = None
+                thumb_url = get_best_thumbnail(info)
+                if thumb_url:
+                    thumb_file = None
+                    if audio_format == 'mp3':
+                        thumb_file = thumbnail_path
+                        register_task_file(task_id, thumbnail_path)
+                    thumb_future = thumbnail_executor.submit(download_thumbnail, thumb_url, thumb_file)
+
+                def artwork_ready():
+                    """Artwork JPEG bytes, or None if there is none."""
+                    if thumb_future is None:
+                        return None
+                    try:
+                        return thumb_future.result(timeout=30)
+                    except Exception as e:
+                        logger.error(f"[THUMB] {e}")
+                        return None
 
                 upload_date = info.get('upload_date', '')
                 year = upload_date[:4] if upload_date and len(upload_date) >= 4 else None
@@ -1163,33 +2197,87 @@ def convert():
                     'genre': 'Music'
                 }
 
-                with progress_lock:
+                audio_temp = output_path + f'_temp.{ext}'
+                register_task_file(task_id, audio_temp)
+
+                if audio_format == 'mp3':
+                    thumb_ok = bool(artwork_ready())
+                    cmd = build_mp3_cmd(
+                        downloaded_file, audio_temp, metadata,
+                        thumbnail_path if thumb_ok else None
+                    )
+                else:
+                    # When the source stream is already in the target codec a
+                    # remux is enough; otherwise encode once to the target.
+                    source_acodec = (info.get('acodec') or '').lower()
+                    same_codec = bool(cfg.get('copy_acodec')) and source_acodec.startswith(cfg['copy_acodec'])
+                    if same_codec and downloaded_file.endswith(f'.{ext}'):
+                        # yt-dlp already delivered the target codec in the
+                        # target container: no need to read and rewrite it.
+                        logger.info(f"[CONVERT] {task_id[:8]} source is {source_acodec}.{ext}, using it as is")
+                        cmd = None
+                    else:
+                        if same_codec:
+                            logger.info(f"[CONVERT] {task_id[:8]} source is {source_acodec}, copying audio stream")
+                            codec_args = ['-c:a', 'copy']
+                        else:
+                            codec_args = [
+                                '-c:a', cfg['codec'],
+                                '-b:a', cfg['bitrate'],
+                                '-ar', cfg['sample_rate'],
+                                '-ac', '2',
+                            ]
+                        # Map only the first audio stream so no video, subtitle
+                        # or data decoders are opened for the source
+                        cmd = ['ffmpeg', '-y', '-i', downloaded_file,
+                               '-map', '0:a:0', '-vn', '-sn', '-dn', *codec_args,
+                               '-threads', str(FFMPEG_THREADS), audio_temp]
+
+                if cmd:
+                    success, error = run_ffmpeg_with_progress(
+                        cmd, task_id, timeout=ffmpeg_timeout, stage="processing",
+                        duration=video_duration, end_percent=91
+                    )
+                    if not success or not os.path.exists(audio_temp):
+                        raise Exception(f"Audio conversion failed: {error[-150:] if error else 'unknown error'}")
+                else:
+                    move_into_place(downloaded_file, audio_temp)
+
+                final_audio = output_path + f'.{ext}'
+                register_task_file(task_id, final_audio)
+
+                if audio_format != 'mp3':
+                    if thumb_future is not None and not thumb_future.done():
+                        with progress_lock(task_id):
+                            conversion_progress[task_id].update({
+                                'status': 'processing',
+                                'percent': 92,
+                                'message': 'Downloading artwork...',
+                                'last_update': time.monotonic()
+                            })
+                    thumb_bytes = artwork_ready()
+                    thumb_ok = bool(thumb_bytes)
+
+                with progress_lock(task_id):
                     conversion_progress[task_id].update({
                         'status': 'embedding',
                         'percent': 95,
                         'message': 'Embedding metadata...',
-                        'last_update': time.time()
+                        'last_update': time.monotonic()
                     })
 
-                if audio_format == 'mp3':
-                    shutil.copy(audio_temp, final_audio)
-                    embed_metadata_mp3_mutagen(final_audio, metadata, thumbnail_path if thumb_ok else None)
-                elif audio_format == 'aac':
-                    shutil.copy(audio_temp, final_audio)
-                    embed_metadata_aac(final_audio, metadata, thumbnail_path if thumb_ok else None)
+                # Same folder, so this is a rename rather than a byte copy.
+                # MP3 already carries its tags and cover from the encode.
+                move_into_place(audio_temp, final_audio)
+                if audio_format == 'aac':
+                    embed_metadata_aac(final_audio, metadata, thumb_bytes)
                 elif audio_format == 'opus':
-                    shutil.copy(audio_temp, final_audio)
-                    embed_metadata_opus(final_audio, metadata, thumbnail_path if thumb_ok else None)
+                    embed_metadata_opus(final_audio, metadata, thumb_bytes)
                 elif audio_format == 'ogg':
-                    shutil.copy(audio_temp, final_audio)
-                    embed_metadata_ogg(final_audio, metadata, thumbnail_path if thumb_ok else None)
-                else:
-                    shutil.copy(audio_temp, final_audio)
+                    embed_metadata_ogg(final_audio, metadata, thumb_bytes)
 
                 # Cleanup
                 try:
-                    if os.path.exists(audio_temp):
-                        os.remove(audio_temp)
                     if os.path.exists(downloaded_file) and downloaded_file != final_audio:
                         os.remove(downloaded_file)
                     if os.path.exists(thumbnail_path):
@@ -1202,56 +2290,74 @@ def convert():
 
             # ===== VIDEO BRANCH (QuickTime-compatible MP4) =====
             else:
-                with progress_lock:
+                with progress_lock(task_id):
                     conversion_progress[task_id].update({
                         'status': 'processing',
                         'percent': 88,
                         'message': 'Converting to QuickTime-compatible MP4...',
-                        'last_update': time.time()
+                        'last_update': time.monotonic()
                     })
 
                 desired_mp4 = output_path + '.mp4'
-                temp_mp4 = output_path + '__enc.mp4' if os.path.abspath(downloaded_file) == desired_mp4 else desired_mp4
-
-                encode_cfg = VIDEO_ENCODE_SETTINGS.get(quality, VIDEO_ENCODE_SETTINGS['best'])
-
-                cmd = [
-                    'ffmpeg', '-y',
-                    '-i', downloaded_file,
-                    '-map', '0:v:0',
-                    '-map', '0:a:0?',
-                    '-c:v', 'libx264',
-                    '-preset', 'medium',
-                    '-profile:v', 'high',
-                    '-level', '4.0',
-                    '-pix_fmt', 'yuv420p',
-                    '-c:a', 'aac',
-                    '-b:a', '192k',
-                    '-ar', '48000',
-                    '-ac', '2',
-                    '-movflags', '+faststart',
-                    '-f', 'mp4'
-                ]
-
-                if encode_cfg['scale']:
-                    cmd.extend(['-vf', f"scale={encode_cfg['scale']}"])
-                if encode_cfg['crf']:
-                    cmd.extend(['-crf', encode_cfg['crf']])
-                if encode_cfg['maxrate'] and encode_cfg['bufsize']:
-                    cmd.extend(['-maxrate', encode_cfg['maxrate'], '-bufsize', encode_cfg['bufsize']])
-
-                cmd.append(temp_mp4)
-
-                success, error = run_ffmpeg_with_progress(cmd, task_id, timeout=ffmpeg_timeout, stage="processing")
+                if os.path.abspath(downloaded_file) == os.path.abspath(desired_mp4):
+                    temp_mp4 = output_path + '__enc.mp4'
+                else:
+                    temp_mp4 = desired_mp4
+                register_task_file(task_id, desired_mp4)
+                register_task_file(task_id, temp_mp4)
+                rendition_paths = {q: output_path + f'_{q}.mp4' for q in extra_qualities}
+                for path in rendition_paths.values():
+                    register_task_file(task_id, path)
+
+                probe = probe_media(downloaded_file)
+                remux = can_stream_copy(probe, quality)
+                # Re-encoding AAC to AAC only loses quality; copy it
+                copy_audio = can_copy_audio(probe)
+                if remux:
+                    logger.info(f"[CONVERT] {task_id[:8]} already H.264/AAC, remuxing only")
+                    with progress_lock(task_id):
+                        conversion_progress[task_id].update({
+                            'message': 'Optimizing MP4 (no re-encode needed)...',
+                            'last_update': time.monotonic()
+                        })
+
+                def video_outputs(codec=None):
+                    main_args = (build_remux_output_args() if remux
+                                 else build_video_output_args(quality, codec, copy_audio))
+                    return [(main_args, temp_mp4)] + [
+                        (build_video_output_args(q, codec, copy_audio), path)
+                        for q, path in rendition_paths.items()
+                    ]
+
+                encodes = not remux or bool(rendition_paths)
+                use_gpu = encodes and VIDEO_ENCODER != 'libx264'
+                cmd = build_multi_output_cmd(
+                    downloaded_file, video_outputs(),
+                    input_args=build_video_input_args(VIDEO_ENCODER) if encodes else ()
+                )
+                cpu_cmd = None
+                if use_gpu:
+                    cpu_cmd = build_multi_output_cmd(downloaded_file, video_outputs(codec='libx264'))
+
+                success, error = run_ffmpeg_with_progress(
+                    cmd, task_id, timeout=ffmpeg_timeout, stage="processing",
+                    duration=video_duration, end_percent=99,
+                    use_gpu=use_gpu, cpu_cmd=cpu_cmd,
+                    # A remuxed main output doesn't open an encoder session
+                    gpu_sessions=len(rendition_paths) + (0 if remux else 1)
+                )
                 if not success or not os.path.exists(temp_mp4):
-                    raise Exception(f"Video conversion failed: {error[:200] if error else 'unknown error'}")
+                    raise Exception(f"Video conversion failed: {error[-200:] if error else 'unknown error'}")
 
-                if os.path.abspath(temp_mp4) != os.path.abspath(desired_mp4):
-                    if os.path.exists(desired_mp4):
-                        os.remove(desired_mp4)
-                    os.rename(temp_mp4, desired_mp4)
+                # Both names derive from output_path, so compare them directly
+                if temp_mp4 != desired_mp4:
+                    move_into_place(temp_mp4, desired_mp4)
 
                 output_file = desired_mp4
+                renditions = {
+                    q: os.path.basename(path) for q, path in rendition_paths.items()
+                    if os.path.exists(path)
+                }
 
                 try:
                     if os.path.exists(downloaded_file) and os.path.abspath(downloaded_file) != os.path.abspath(output_file):
@@ -1270,10 +2376,10 @@ def convert():
 
             ext = os.path.splitext(output_file)[1][1:]
             safe_title = sanitize_filename(title)
-            total_time = time.time() - start_time
+            total_time = time.monotonic() - start_time
             time_str = f"{int(total_time//60)}m {int(total_time%60)}s" if total_time >= 60 else f"{int(total_time)}s"
 
-            with progress_lock:
+            with progress_lock(task_id):
                 conversion_progress[task_id] = {
                     'status': 'completed',
                     'percent': 100,
@@ -1286,8 +2392,13 @@ def convert():
                     'audio_format': audio_format if format_type == 'audio' else None,
                     'quality': AUDIO_FORMATS[audio_format]['quality'] if format_type == 'audio' else quality,
                     'extension': ext,
-                    'last_update': time.time()
+                    'last_update': time.monotonic()
                 }
+                if renditions:
+                    conversion_progress[task_id]['renditions'] = renditions
+            # Intermediates are already gone; the output is left for
+            # download and the age-based cleanup thread.
+            forget_task_files(task_id)
 
             logger.info(f"[CONVERT] ✓ {safe_title[:30]} ({final_size/(1024*1024):.1f}MB, {ext}) in {time_str}")
 
@@ -1295,7 +2406,7 @@ def convert():
             err = str(e)[:300]
             logger.error(f"[CONVERT] ✗ {task_id[:8]}: {err}")
             logger.error(traceback.format_exc())
-            with process_lock:
+            with process_lock(task_id):
                 if task_id in active_processes:
                     try:
                         p = active_processes[task_id]
@@ -1306,32 +2417,73 @@ def convert():
                     except Exception:
                         pass
                     active_processes.pop(task_id, None)
-            with progress_lock:
+            with progress_lock(task_id):
                 conversion_progress[task_id] = {
                     'status': 'error',
                     'percent': 0,
                     'message': f'Error: {err}',
-                    'last_update': time.time()
+                    'last_update': time.monotonic()
                 }
-            for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER]:
-                try:
-                    for fname in os.listdir(folder):
-                        if fname.startswith(task_id):
-                            os.remove(os.path.join(folder, fname))
-                except Exception:
-                    pass
+            remove_task_files(task_id)
         finally:
             if acquired:
                 active_downloads.release()
 
     threading.Thread(target=run_conversion, daemon=True).start()
+    return task_id, None
 
+
+def conversion_cost():
+    """Conversions a request starts: a batch counts each of its items."""
+    if request.endpoint == 'convert_batch':
+        data = request.get_json(silent=True)
+        items = data.get('items') if isinstance(data, dict) else None
+        if isinstance(items, list):
+            return max(1, min(len(items), MAX_BATCH_SIZE))
+    return 1
+
+
+# One budget for /api/convert and /api/convert-batch together, so batches
+# can't double a client's conversions per minute
+conversion_limit = limiter.shared_limit("20 per minute", scope="conversions", cost=conversion_cost)
+
+
+@app.route('/api/convert', methods=['POST'])
+@conversion_limit
+def convert():
+    task_id, error = start_conversion(request.get_json() or {})
+    if error:
+        return jsonify({'error': error}), 400
     return jsonify({'success': True, 'task_id': task_id, 'message': 'Conversion started'})
 
 
+@app.route('/api/convert-batch', methods=['POST'])
+@conversion_limit
+@limiter.limit("4 per minute")
+def convert_batch():
+    """Start up to MAX_BATCH_SIZE conversions from one request.
+
+    Body: {"items": [<same fields as /api/convert>, ...]}. Each item becomes
+    its own task (and its own active_downloads slot); results keep the
+    request order. Every item is charged against the conversion limit
+    shared with /api/convert.
+    """
+    items = (request.get_json() or {}).get('items')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'items must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'At most {MAX_BATCH_SIZE} items per batch'}), 400
+
+    tasks = []
+    for item in items:
+        task_id, error = start_conversion(item if isinstance(item, dict) else {})
+        tasks.append({'error': error} if error else {'task_id': task_id})
+    return jsonify({'success': True, 'tasks': tasks})
+
+
 @app.route('/api/cancel/<task_id>', methods=['POST'])
 def cancel(task_id):
-    with process_lock:
+    with process_lock(task_id):
         if task_id in active_processes:
             try:
                 p = active_processes[task_id]
@@ -1343,38 +2495,113 @@ def cancel(task_id):
                 pass
             active_processes.pop(task_id, None)
 
-    with progress_lock:
+    with progress_lock(task_id):
         if task_id in conversion_progress:
             conversion_progress[task_id] = {
                 'status': 'cancelled',
                 'percent': 0,
                 'message': 'Download cancelled by user',
-                'last_update': time.time()
+                'last_update': time.monotonic()
             }
 
-    for folder in [DOWNLOAD_FOLDER, TEMP_FOLDER]:
-        try:
-            for fname in os.listdir(folder):
-                if fname.startswith(task_id):
-                    os.remove(os.path.join(folder, fname))
-        except Exception:
-            pass
+    remove_task_files(task_id)
 
     logger.info(f"[CANCEL] Task {task_id[:8]} cancelled")
     return jsonify({'status': 'cancelled'})
 
 
+def read_progress(task_id):
+    """Client-facing copy of a task's progress; caller holds its stripe."""
+    prog = conversion_progress.get(task_id, {
+        'status': 'unknown',
+        'percent': 0,
+        'message': 'Task not found'
+    }).copy()
+    prog.pop('last_update', None)
+    return prog
+
+
+def progress_snapshot(task_id):
+    """Client-facing copy of a task's progress."""
+    with progress_lock(task_id):
+        return read_progress(task_id)
+
+
 @app.route('/api/progress/<task_id>')
 @limiter.exempt
 def progress(task_id):
-    with progress_lock:
-        prog = conversion_progress.get(task_id, {
-            'status': 'unknown',
-            'percent': 0,
-            'message': 'Task not found'
-        }).copy()
-    prog.pop('last_update', None)
-    return jsonify(prog)
+    return jsonify(progress_snapshot(task_id))
+
+
+# Open SSE streams per client address, see progress_stream
+progress_streams = {}
+progress_streams_lock = threading.Lock()
+
+
+def release_progress_stream(client):
+    with progress_streams_lock:
+        if progress_streams.get(client, 0) <= 1:
+            progress_streams.pop(client, None)
+        else:
+            progress_streams[client] -= 1
+
+
+@app.route('/api/progress-stream/<task_id>')
+@limiter.exempt
+def progress_stream(task_id):
+    """Server-sent events version of /api/progress.
+
+    The stream sleeps on the task's progress_lock condition, which every
+    progress update notifies, so nothing is polled: an event goes out
+    when the snapshot changed (at most one per PROGRESS_STREAM_INTERVAL,
+    so bursts coalesce), and the stream ends once the task is finished.
+
+    A stream occupies a worker thread until the task finishes, so serve
+    the app with threaded or gevent workers (gunicorn -k gthread/gevent),
+    not a small sync pool. Each client address may hold
+    PROGRESS_STREAMS_PER_CLIENT streams; past that it gets a 429, and
+    the page falls back to polling /api/progress.
+    """
+    client = get_remote_address()
+    with progress_streams_lock:
+        if progress_streams.get(client, 0) >= PROGRESS_STREAMS_PER_CLIENT:
+            return jsonify({'error': 'Too many open progress streams'}), 429
+        progress_streams[client] = progress_streams.get(client, 0) + 1
+
+    cond = progress_lock.condition(task_id)
+
+    def events():
+        last_sent = None
+        last_write = time.monotonic()
+        while True:
+            # Check and wait under the stripe lock, so an update landing
+            # between the two can't be missed
+            with cond:
+                prog = read_progress(task_id)
+                if prog == last_sent:
+                    remaining = PROGRESS_STREAM_KEEPALIVE - (time.monotonic() - last_write)
+                    if remaining > 0:
+                        cond.wait(timeout=remaining)
+                    prog = read_progress(task_id)
+            now = time.monotonic()
+            if prog != last_sent:
+                yield f"data: {app.json.dumps(prog)}\n\n"
+                if prog.get('status') in ['completed', 'error', 'cancelled', 'unknown']:
+                    return
+                last_sent = prog
+                last_write = now
+                time.sleep(PROGRESS_STREAM_INTERVAL)  # let bursts coalesce
+            elif now - last_write >= PROGRESS_STREAM_KEEPALIVE:
+                yield ": keepalive\n\n"
+                last_write = now
+
+    resp = Response(events(), mimetype='text/event-stream')
+    # Runs when the server closes the response, even if the generator
+    # never started (client gone before the first event)
+    resp.call_on_close(lambda: release_progress_stream(client))
+    resp.headers['Cache-Control'] = 'no-cache'
+    resp.headers['X-Accel-Buffering'] = 'no'  # nginx: don't buffer the stream
+    return resp
 
 
 @app.route('/api/download/<task_id>')
@@ -1382,27 +2609,28 @@ def progress(task_id):
 def download(task_id):
     title = request.args.get('title', 'download')
 
-    with progress_lock:
+    with progress_lock(task_id):
         info = conversion_progress.get(task_id, {})
     is_video = info.get('format') == 'video'
 
-    preferred_exts = ['.mp4'] if is_video else ['.mp3', '.m4a', '.opus', '.ogg']
-
-    file_found = None
-    if os.path.exists(DOWNLOAD_FOLDER):
-        for ext in preferred_exts:
-            p = os.path.join(DOWNLOAD_FOLDER, f"{task_id}{ext}")
-            if os.path.exists(p):
-                file_found = p
-                break
-        if not file_found:
-            for fname in os.listdir(DOWNLOAD_FOLDER):
-                if fname.startswith(task_id):
-                    candidate = os.path.join(DOWNLOAD_FOLDER, fname)
-                    if is_video and not candidate.lower().endswith('.mp4'):
-                        continue
-                    file_found = candidate
-                    break
+    # Extra renditions have fixed names ('<task_id>_<quality>.mp4'), so
+    # they are found on disk even after the progress entry expired.
+    rendition = request.args.get('quality')
+    if rendition:
+        if rendition not in VIDEO_ENCODE_SETTINGS:
+            return jsonify({'error': 'File not found'}), 404
+        file_found = os.path.join(DOWNLOAD_FOLDER, f"{task_id}_{rendition}.mp4")
+    # A completed task records its output name, so the common case is a
+    # direct path; the scan below only runs for tasks no longer tracked.
+    elif info.get('filename'):
+        file_found = os.path.join(DOWNLOAD_FOLDER, info['filename'])
+    else:
+        # Exact '<task_id><ext>' names only: renditions ('_720p.mp4') and
+        # intermediates ('__enc.mp4') share the prefix and must never
+        # stand in for the main output.
+        file_found = find_task_file(
+            task_id, {'.mp4': 0} if is_video else OUTPUT_EXT_PRIORITY, other_suffix=None
+        )
 
     if not file_found or not os.path.exists(file_found):
         return jsonify({'error': 'File not found'}), 404
@@ -1420,40 +2648,69 @@ def download(task_id):
 
     @after_this_request
     def cleanup(response):
-        def delayed():
-            time.sleep(30)
-            with progress_lock:
-                conversion_progress.pop(task_id, None)
-        threading.Thread(target=delayed, daemon=True).start()
+        schedule_progress_expiry(task_id)
         return response
 
     safe_title = sanitize_filename(title)
-    return send_file(
-        file_found,
+    if X_ACCEL_REDIRECT_PREFIX:
+        # Headers only; nginx serves the body and any Range requests
+        resp = werkzeug_send_file(
+            os.path.abspath(file_found),
+            request.environ,
+            as_attachment=True,
+            download_name=f"{safe_title}{ext}",
+            mimetype=mimetype,
+            conditional=False,
+            use_x_sendfile=True
+        )
+        del resp.headers['X-Sendfile']
+        del resp.headers['Content-Length']  # body is empty here
+        resp.headers['X-Accel-Redirect'] = (
+            f"{X_ACCEL_REDIRECT_PREFIX.rstrip('/')}/{quote(os.path.basename(file_found))}"
+        )
+        return resp
+
+    # Servers with wsgi.file_wrapper (gunicorn, uWSGI) use sendfile(2) for
+    # the body. Without one (the built-in server) Werkzeug reads 8 KiB at a
+    # time; hand it a wrapper with 1 MiB reads instead.
+    environ = request.environ
+    if 'wsgi.file_wrapper' not in environ:
+        environ = dict(environ)
+        environ['wsgi.file_wrapper'] = lambda f, _size: FileWrapper(f, SEND_FILE_CHUNK_SIZE)
+
+    # conditional=True gives Range/If-Range support, so clients can resume.
+    # The ETag hashes mtime, size and path, and Last-Modified is the file's
+    # mtime: a resume against a different or rewritten file fails If-Range
+    # and gets the whole new body instead of spliced bytes.
+    resp = werkzeug_send_file(
+        os.path.abspath(file_found),
+        environ,
         as_attachment=True,
         download_name=f"{safe_title}{ext}",
-        mimetype=mimetype
+        mimetype=mimetype,
+        conditional=True,
+        etag=True,
+        last_modified=os.path.getmtime(file_found),
+        use_x_sendfile=app.config['USE_X_SENDFILE'],
+        response_class=app.response_class
     )
+    # Werkzeug only sends Accept-Ranges on range replies; advertise it on
+    # the full 200 too so download managers know they can resume/split.
+    resp.headers['Accept-Ranges'] = 'bytes'
+    resp.cache_control.private = True  # per-task output, not for shared caches
+    return resp
 
 
 @app.route('/api/supported-platforms')
 def supported_platforms():
-    return jsonify({
-        'platforms': [
-            {'name': 'YouTube',   'icon': 'fab fa-youtube',   'color': '#FF0000'},
-            {'name': 'Facebook',  'icon': 'fab fa-facebook',  'color': '#1877F2'},
-            {'name': 'Instagram', 'icon': 'fab fa-instagram', 'color': '#E4405F'},
-            {'name': 'TikTok',    'icon': 'fab fa-tiktok',    'color': '#000000'},
-            {'name': 'Twitter/X', 'icon': 'fab fa-twitter',   'color': '#1DA1F2'},
-        ]
-    })
+    return static_json_response(SUPPORTED_PLATFORMS_JSON)
 
 
 @app.route('/health')
 def health():
-    with process_lock:
+    with process_lock.all():
         active_procs = len(active_processes)
-    with progress_lock:
+    with progress_lock.all():
         active_tasks = len(conversion_progress)
     with cache_lock:
         cached_videos = len(video_info_cache)
@@ -1463,29 +2720,40 @@ def health():
         'active_processes': active_procs,
         'active_tasks': active_tasks,
         'cached_videos': cached_videos,
+        'cached_videos_max': VIDEO_INFO_CACHE_SIZE,
         'max_duration_hours': MAX_DURATION // 3600,
-        'psutil_available': HAS_PSUTIL
+        'psutil_available': HAS_PSUTIL,
+        'compression_available': HAS_COMPRESS,
+        'video_encoder': VIDEO_ENCODER
     })
 
 
 @app.route('/api/admin/kill-all', methods=['POST'])
 def admin_kill_all():
     """Emergency kill of all running processes and tasks."""
-    with process_lock:
-        for task_id, p in list(active_processes.items()):
-            try:
-                if hasattr(p, 'pid'):
-                    kill_process_tree(p.pid)
-                else:
-                    p.kill()
-            except Exception:
-                pass
-        active_processes.clear()
-
-    with progress_lock:
-        for tid in list(conversion_progress.keys()):
-            if conversion_progress[tid].get('status') not in ['completed', 'error', 'cancelled']:
-                conversion_progress[tid] = {
+    # Snapshot under all stripes, then kill/mark each task under its own
+    # stripe so progress polls aren't blocked while processes die.
+    with process_lock.all():
+        procs = list(active_processes.items())
+    for task_id, p in procs:
+        try:
+            if hasattr(p, 'pid'):
+                kill_process_tree(p.pid)
+            else:
+                p.kill()
+        except Exception:
+            pass
+        with process_lock(task_id):
+            if active_processes.get(task_id) is p:
+                del active_processes[task_id]
+
+    with progress_lock.all():
+        task_ids = list(conversion_progress.keys())
+    for task_id in task_ids:
+        with progress_lock(task_id):
+            info = conversion_progress.get(task_id)
+            if info and info.get('status') not in ['completed', 'error', 'cancelled']:
+                conversion_progress[task_id] = {
                     'status': 'error',
                     'percent': 0,
                     'message': 'Manually terminated'
@@ -1497,24 +2765,29 @@ def admin_kill_all():
                 os.remove(os.path.join(folder, fname))
         except Exception:
             pass
+    with task_files_lock:
+        task_files.clear()
 
     return jsonify({'status': 'all_killed'})
 
 
 @app.route('/api/admin/status')
 def admin_status():
-    with progress_lock:
-        tasks = {
-            tid[:8]: {
-                'status': info.get('status'),
-                'percent': info.get('percent'),
-                'message': info.get('message', '')[:60],
-                'age': int(time.time() - info.get('last_update', time.time()))
-            }
-            for tid, info in conversion_progress.items()
-        }
-    with process_lock:
+    # Hold the stripes only for the copy; build the projection afterwards
+    with progress_lock.all():
+        snapshot = list(conversion_progress.items())
+    with process_lock.all():
         procs = list(active_processes.keys())
+    now = time.monotonic()
+    tasks = {
+        tid[:8]: {
+            'status': info.get('status'),
+            'percent': info.get('percent'),
+            'message': info.get('message', '')[:60],
+            'age': int(now - info.get('last_update', now))
+        }
+        for tid, info in snapshot
+    }
     return jsonify({
         'tasks': tasks,
         'active_processes': [p[:8] for p in procs],
@@ -1530,6 +2803,8 @@ if __name__ == '__main__':
     logger.info(f"[SERVER] FFMPEG timeout: {FFMPEG_TIMEOUT // 60} minutes")
     logger.info(f"[SERVER] Download folder: {os.path.abspath(DOWNLOAD_FOLDER)}")
     logger.info(f"[SERVER] psutil available: {HAS_PSUTIL}")
+    logger.info(f"[SERVER] Rate limit storage: {urlparse(os.getenv('RATELIMIT_STORAGE_URI', 'memory://')).scheme}")
+    logger.info(f"[SERVER] Video encoder: {VIDEO_ENCODER}")
     logger.info("[SERVER] Video output: QuickTime-compatible MP4 (H.264 + AAC)")
     logger.info("=" * 60)
     app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -74,6 +74,7 @@ let state = {
     hasThumbnail: false,
     fileSize: 0,
     progressInterval: null,
+    progressSource: null,
     debounceTimer: null,
     cancelRequested: false,
     currentStage: 'starting',
@@ -479,17 +480,86 @@ function completeStage(name) {
 }
 
 // ===== Progress Tracking =====
+function stopProgressTracking() {
+    if (state.progressInterval) {
+        clearInterval(state.progressInterval);
+        state.progressInterval = null;
+    }
+    if (state.progressSource) {
+        state.progressSource.close();
+        state.progressSource = null;
+    }
+}
+
+// Returns true once the task reached a final state
+function handleProgressData(data) {
+    updateProgress(data);
+
+    if (data.status === 'completed') {
+        stopProgressTracking();
+        state.title = data.title || state.title || 'download';
+        state.hasThumbnail = data.has_thumbnail || false;
+        state.fileSize = data.file_size || 0;
+        animateProgressTo100();
+        return true;
+    }
+    if (data.status === 'error') {
+        stopProgressTracking();
+        state.isConverting = false;
+        if (elements.cancelBtn) elements.cancelBtn.classList.remove('show');
+        showError(data.message || 'Failed');
+        return true;
+    }
+    // Task expired / server restarted, or cancelled from somewhere else:
+    // nothing more will arrive for this task, so don't leave the bar up
+    if (data.status === 'unknown' || (data.status === 'cancelled' && !state.cancelRequested)) {
+        state.taskId = null;
+        state.lastPercent = 0;
+        showError(data.status === 'unknown'
+            ? 'This conversion is no longer available. Please try again.'
+            : 'Conversion was cancelled.');
+        return true;
+    }
+    return false;
+}
+
 function startProgressTracking() {
     console.log('🚀 Starting progress tracking');
-    
-    if (state.progressInterval) clearInterval(state.progressInterval);
-    
+    stopProgressTracking();
+
+    if (!window.EventSource) {
+        startProgressPolling();
+        return;
+    }
+
+    // Server pushes an event whenever the task's progress changes
+    const source = new EventSource(`${API_BASE}/api/progress-stream/${state.taskId}`);
+    state.progressSource = source;
+
+    source.onmessage = (event) => {
+        if (state.cancelRequested) {
+            stopProgressTracking();
+            return;
+        }
+        const data = JSON.parse(event.data);
+        console.log('📊 Progress:', data);  // Debug log
+        handleProgressData(data);
+    };
+
+    source.onerror = () => {
+        // Stream dropped (proxy, server restart...): fall back to polling
+        if (state.progressSource !== source) return;
+        stopProgressTracking();
+        if (!state.cancelRequested) startProgressPolling();
+    };
+}
+
+function startProgressPolling() {
     let errors = 0;
     
     state.progressInterval = setInterval(async () => {
         if (state.cancelRequested) {
-            clearInterval(state.progressInterval);
-            state.progressInterval = null;
+            stopProgressTracking();
             return;
         }
 
@@ -501,28 +571,12 @@ function startProgressTracking() {
             console.log('📊 Progress:', data);  // Debug log
             
             errors = 0;
-            updateProgress(data);
-
-            if (data.status === 'completed') {
-                clearInterval(state.progressInterval);
-                state.progressInterval = null;
-                state.title = data.title || state.title || 'download';
-                state.hasThumbnail = data.has_thumbnail || false;
-                state.fileSize = data.file_size || 0;
-                animateProgressTo100();
-            } else if (data.status === 'error') {
-                clearInterval(state.progressInterval);
-                state.progressInterval = null;
-                state.isConverting = false;
-                if (elements.cancelBtn) elements.cancelBtn.classList.remove('show');
-                showError(data.message || 'Failed');
-            }
+            handleProgressData(data);
         } catch (e) {
             errors++;
             console.error('Progress error:', e);
             if (errors >= 5) {
-                clearInterval(state.progressInterval);
-                state.progressInterval = null;
+                stopProgressTracking();
                 state.isConverting = false;
                 showError('Connection lost');
             }
@@ -711,10 +765,7 @@ function handleCancel() {
     showToast('🚫 Cancelled', 'error', 2000);
     
     setTimeout(() => {
-        if (state.progressInterval) {
-            clearInterval(state.progressInterval);
-            state.progressInterval = null;
-        }
+        stopProgressTracking();
         if (elements.cancelBtn) {
             elements.cancelBtn.classList.remove('show');
             elements.cancelBtn.innerHTML = '<i class="fas fa-times"></i> Cancel';
@@ -785,10 +836,7 @@ function handleDownload() {
 function showError(message) {
     setLoading(false);
     
-    if (state.progressInterval) {
-        clearInterval(state.progressInterval);
-        state.progressInterval = null;
-    }
+    stopProgressTracking();
     
     state.isConverting = false;
     if (elements.cancelBtn) elements.cancelBtn.classList.remove('show');
@@ -803,10 +851,7 @@ function showError(message) {
 
 // ===== Reset =====
 function resetConverter() {
-    if (state.progressInterval) {
-        clearInterval(state.progressInterval);
-        state.progressInterval = null;
-    }
+    stopProgressTracking();
     
     state.taskId = null;
     state.title = '';
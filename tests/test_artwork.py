@@ -0,0 +1,68 @@
+"""Artwork pipeline checks for the Pillow path and the optional libvips one.
+
+Run from the repository root: python -m pytest -q tests
+"""
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+import app
+
+requires_pyvips = pytest.mark.skipif(not app.HAS_PYVIPS, reason='pyvips not installed')
+
+
+def encode(img, fmt):
+    out = BytesIO()
+    img.save(out, fmt)
+    return out.getvalue()
+
+
+def open_jpeg(data):
+    img = Image.open(BytesIO(data))
+    assert img.format == 'JPEG'
+    return img
+
+
+@requires_pyvips
+def test_rgba_png_is_flattened_to_square_rgb_jpeg():
+    src = Image.new('RGBA', (1280, 720), (200, 30, 30, 128))
+    img = open_jpeg(app.vips_artwork(encode(src, 'PNG')))
+    assert img.size == (app.ARTWORK_SIZE, app.ARTWORK_SIZE)
+    assert img.mode == 'RGB'
+
+
+@requires_pyvips
+def test_greyscale_jpeg_is_converted_to_srgb():
+    src = Image.new('L', (900, 1600), 90)
+    img = open_jpeg(app.vips_artwork(encode(src, 'JPEG')))
+    assert img.size == (app.ARTWORK_SIZE, app.ARTWORK_SIZE)
+    assert img.mode == 'RGB'
+
+
+@requires_pyvips
+def test_oversized_image_is_refused_from_its_header():
+    side = int(app.THUMBNAIL_MAX_PIXELS ** 0.5) + 100
+    src = Image.new('L', (side, side))
+    assert app.vips_artwork(encode(src, 'PNG')) is None
+
+
+@requires_pyvips
+def test_format_outside_thumbnail_formats_is_refused():
+    src = Image.new('RGB', (700, 700), (0, 0, 255))
+    assert app.vips_artwork(encode(src, 'GIF')) is None
+
+
+@pytest.mark.filterwarnings('ignore::PIL.Image.DecompressionBombWarning')
+def test_pil_oversized_image_is_refused_below_pillows_bomb_error():
+    # Over THUMBNAIL_MAX_PIXELS but under 2x, where Pillow itself only warns
+    side = int((app.THUMBNAIL_MAX_PIXELS * 1.5) ** 0.5)
+    src = Image.new('L', (side, side))
+    assert app.pil_artwork(encode(src, 'PNG')) is None
+
+
+def test_pil_artwork_is_square_rgb_jpeg():
+    src = Image.new('RGB', (1280, 720), (10, 120, 200))
+    img = open_jpeg(app.pil_artwork(encode(src, 'JPEG')))
+    assert img.size == (app.ARTWORK_SIZE, app.ARTWORK_SIZE)
+    assert img.mode == 'RGB'